@@ -1,22 +1,62 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context
 import os
-import requests
 import json
 import pandas as pd
 import random
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from collections import defaultdict, Counter
-from utils.tc_scraper import download_twitch_chat
+from utils.tc_scraper import download_twitch_chat, BOT_NAMES
 from utils.llm_processor import process_comments
-from utils.llm_processor_v2 import batch_process_comments
+from utils.llm_processor_v2 import batch_process_comments, fold_personas, metrics, rate_governor
 from utils.llm_processor_v2 import compare_personas
 from utils.twitch_api import get_vod_metadata
-from utils.yt_scraper import download_youtube_chat
+from utils.yt_scraper import download_youtube_chat, KNOWN_YOUTUBE_BOTS
+from utils.chat_store import read_chat
+from utils.timeline import ChatTimeline, parse_clock_times
 from utils.youtube_api import get_video_metadata
+from utils.jobs import JobQueue, QUEUED, RUNNING, FAILED
+from utils import http_client
+from utils.json_cache import RemoteJSONCache
+from utils.catalog import VODCatalog
+from utils.live import LiveRegistry
+from utils.metrics import StageTimer
+from config import (
+    JOB_WORKERS, JOB_LEASE_SECONDS, STORAGE_CONCURRENCY, LLM_PROMPT_TOKEN_BUDGET, LLM_SAMPLE_BUDGET, LLM_CLUSTER_COUNT,
+    JSON_CACHE_TTL, JSON_CACHE_NEGATIVE_TTL, JSON_CACHE_MAX_ENTRIES,
+    LIVE_WINDOW_SECONDS, LIVE_UPDATE_MINUTES, LIVE_UPDATE_MESSAGES, LIVE_MAX_PENDING, LIVE_SSE_SECONDS,
+    LIVE_HEARTBEAT_SECONDS
+)
 
 app = Flask(__name__)
 app.config['DATA_DIR'] = 'data'
 
+CHART_BUCKET_MINUTES = [1, 5, 15]
+
+# Analyses run in the background; POST handlers only enqueue them
+job_queue = JobQueue(os.path.join(app.config['DATA_DIR'], 'jobs.db'), max_workers=JOB_WORKERS,
+                     lease_seconds=JOB_LEASE_SECONDS)
+
+# Index of analyzed VODs, maintained by save_analysis
+vod_catalog = VODCatalog(os.path.join(app.config['DATA_DIR'], 'catalog.db'))
+
+# Live streams, each followed by whichever worker holds its lease; snapshots are files so any worker can stream them
+live_sessions = LiveRegistry(
+    os.path.join(app.config['DATA_DIR'], 'live'),
+    heartbeat_seconds=LIVE_HEARTBEAT_SECONDS,
+    window_seconds=LIVE_WINDOW_SECONDS,
+    update_minutes=LIVE_UPDATE_MINUTES,
+    update_messages=LIVE_UPDATE_MESSAGES,
+    max_pending=LIVE_MAX_PENDING
+)
+
+# Supabase JSON is cached in memory and written back under data/remote_cache
+remote_json_cache = RemoteJSONCache(
+    os.path.join(app.config['DATA_DIR'], 'remote_cache'),
+    ttl=JSON_CACHE_TTL, negative_ttl=JSON_CACHE_NEGATIVE_TTL, max_entries=JSON_CACHE_MAX_ENTRIES
+)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -26,32 +66,21 @@ def about():
     return render_template('about.html')
 
 def bucketize_chat(messages, bucket_minutes=5):
-    def parse_time(t):
-        h, m, s = map(int, t.split(":"))
-        return timedelta(hours=h, minutes=m, seconds=s)
-
-    buckets = defaultdict(list)
-
-    for i, msg in enumerate(messages):
-        t = parse_time(msg["time"]).total_seconds()
-        bucket_seconds = int((t // (bucket_minutes * 60)) * (bucket_minutes * 60))
-        bucket_key = str(timedelta(seconds=bucket_seconds))
-        buckets[bucket_key].append((i, msg))
-
-    results = []
-    for key, entries in sorted(buckets.items()):
-        indices, msgs = zip(*entries)
-        themes = [m["category"] for m in msgs if m["category"]]
-        most_common_theme = Counter(themes).most_common(1)
-        theme = most_common_theme[0][0] if most_common_theme else None
-        results.append({
-            "time": key,
-            "count": len(msgs),
-            "first_index": indices[0],
-            "theme": theme
-        })
-
-    return results
+    timeline = ChatTimeline(
+        parse_clock_times([msg["time"] for msg in messages]),
+        categories=[msg["category"] for msg in messages]
+    )
+    return timeline.buckets(bucket_minutes)
+
+def load_chat_timeline(vod_id):
+    """Timeline for a downloaded VOD, or None if its chat is not stored locally."""
+    for platform in ['twitch', 'youtube']:
+        try:
+            chat_df = read_chat(app.config['DATA_DIR'], platform, vod_id, columns=['time_in_seconds'])
+        except FileNotFoundError:
+            continue
+        return ChatTimeline(chat_df['time_in_seconds'].to_numpy(dtype=float, na_value=float('nan')))
+    return None
 
 @app.route('/demo')
 def demo():
@@ -149,11 +178,23 @@ def demo():
 
 @app.route('/results/<vod_id>')
 def show_results(vod_id):
+    job_id = request.args.get('job')
+    job = job_queue.get(job_id) if job_id else job_queue.latest_for_vod(vod_id)
+    if job and job['status'] in (QUEUED, RUNNING):
+        return render_template('processing.html', vod_id=vod_id, job=job)
+    if job_id and job and job['status'] == FAILED:
+        return render_template('error.html', message=job['error'])
+
     # Load analysis data
+    loaded = load_json_many([
+        f'personas/{vod_id}_personas.json',
+        f'summaries/{vod_id}_summaries.json',
+        f'metadata/{vod_id}_metadata.json'
+    ])
     analysis_data = {
-        'personas': load_json(f'personas/{vod_id}_personas.json'),
-        'summaries': load_json(f'summaries/{vod_id}_summaries.json'),
-        'video_info': load_json(f'metadata/{vod_id}_metadata.json')
+        'personas': loaded[f'personas/{vod_id}_personas.json'],
+        'summaries': loaded[f'summaries/{vod_id}_summaries.json'],
+        'video_info': loaded[f'metadata/{vod_id}_metadata.json']
     }
 
     # List of available icons
@@ -167,7 +208,24 @@ def show_results(vod_id):
     for persona, icon in zip(analysis_data['personas'], selected_icons):
         persona['icon'] = icon
 
-    return render_template('results.html', vod_id=vod_id, **analysis_data)
+    # Message volume at a few zoom levels, all from one sorted array
+    timeline = load_chat_timeline(vod_id)
+    chart_data = {
+        minutes: timeline.buckets(minutes) for minutes in CHART_BUCKET_MINUTES
+    } if timeline is not None and len(timeline) else None
+
+    return render_template('results.html', vod_id=vod_id, chart_data=chart_data, **analysis_data)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render() + rate_governor.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 @app.route('/download_twitch', methods=['POST'])
 def download_twitch():
@@ -175,57 +233,214 @@ def download_twitch():
         twitch_url = request.form.get('twitch_url').strip()
         vod_id = twitch_url.split('/videos/')[-1].split('?')[0]
 
-        success, message = download_twitch_chat(twitch_url, app.config['DATA_DIR'])
-        if not success:
-            return render_template('error.html', message=message)
+        incremental = request.form.get('incremental') == '1'
 
-        comments_path = os.path.join(app.config['DATA_DIR'], 'twitch_chat', f'{vod_id}.csv')
-        comments_df = pd.read_csv(comments_path)
-        # result = process_comments(comments_df)
-        result = batch_process_comments(comments_df, batch_size=200, num_personas=3)
+        job_id = job_queue.submit('twitch', vod_id, {'url': twitch_url, 'incremental': incremental})
+        return redirect(url_for('show_results', vod_id=vod_id, job=job_id))
 
-        personas = result.get("personas", [])
-        summaries = {
-            "overall_summary": " ".join(result.get("summaries", {}).values()),
-            "total_messages": len(comments_df),
-            "unique_users": comments_df['author_id'].nunique() if 'author_id' in comments_df.columns else "N/A"
-        }
-
-        # Fetch Twitch VOD metadata
-        vod_metadata = get_vod_metadata(vod_id)
-        if not vod_metadata:
-            raise Exception("Unable to fetch VOD metadata")
-
-        # Fix the thumbnail
-        raw_url = vod_metadata["thumbnail_url"]
-        thumbnail = raw_url.replace("%{width}", "640").replace("%{height}", "360")
-
-        # Format the stream date
-        created_at = vod_metadata.get("created_at")
-        stream_date = datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ").strftime("%B %d, %Y") if created_at else "Unknown"
-
-        # Build metadata
-        video_info = {
-            "title": vod_metadata["title"],
-            "duration": vod_metadata["duration"],
-            "thumbnail": thumbnail,
-            "broadcaster": vod_metadata["user_name"],
-            "stream_date": stream_date,
-            "views": vod_metadata["view_count"],
-            "language": vod_metadata.get("language", "N/A")
-        }
+    except Exception as e:
+        return render_template('error.html', message=str(e))
 
+def load_previous_analysis(vod_id):
+    """Stored personas and summaries for a VOD, or None if it was never fully analyzed."""
+    loaded = load_json_many([f'personas/{vod_id}_personas.json', f'summaries/{vod_id}_summaries.json'])
+    personas = loaded[f'personas/{vod_id}_personas.json']
+    summaries = loaded[f'summaries/{vod_id}_summaries.json']
+    if not personas or not isinstance(summaries, dict) or not summaries.get('total_messages'):
+        return None
+    return {'personas': personas, 'summaries': summaries}
+
+def sum_counts(previous, new):
+    """Field-wise sum of two flat dicts of counters (ParseStats / sampling summaries)."""
+    merged = dict(previous)
+    for key, value in new.items():
+        if isinstance(value, (int, float)) and isinstance(merged.get(key), (int, float)):
+            merged[key] = round(merged[key] + value, 4)
+        else:
+            merged.setdefault(key, value)
+    return merged
+
+def merge_summaries(previous, new, analyzed, new_messages):
+    """Stored summaries extended with an incremental run over new_messages after analyzed ones.
+
+    The summary text is appended, and sampling and LLM response stats are
+    summed so they describe the whole chat; a slice that was not sampled
+    counts as fully analyzed.
+    """
+    merged = dict(previous, total_messages=new['total_messages'], unique_users=new['unique_users'])
+    merged['overall_summary'] = " ".join(
+        text for text in (previous.get('overall_summary'), new['overall_summary']) if text
+    )
+    if previous.get('sampling') or new.get('sampling'):
+        def census(n):
+            return {"population": n, "sample_size": n, "strata": 0, "effective_sample_size": float(n)}
+        merged['sampling'] = sum_counts(previous.get('sampling') or census(analyzed),
+                                        new.get('sampling') or census(new_messages))
+    if new.get('llm_responses'):
+        merged['llm_responses'] = sum_counts(previous.get('llm_responses', {}), new['llm_responses'])
+    return merged
+
+def analyze_chat(platform, vod_id, progress, incremental=False, timer=None):
+    """Personas and summaries for a downloaded chat.
+
+    In incremental mode only messages past the previous analysis's
+    total_messages are sent to the LLM (new chat is appended to the file),
+    their personas are folded into the stored ones, and the stored
+    summaries are extended rather than replaced.
+    """
+    with timer.span('read_chat') if timer else nullcontext():
+        comments_df = read_chat(app.config['DATA_DIR'], platform, vod_id, columns=['text', 'author_id', 'time_in_seconds'])
+    progress.update(stage='analyzing', downloaded=len(comments_df))
+
+    previous = load_previous_analysis(vod_id) if incremental else None
+    analyzed = min(previous['summaries']['total_messages'], len(comments_df)) if previous else 0
+    new_df = comments_df.iloc[analyzed:]
+    if previous:
+        progress.update(new_messages=len(new_df))
+        print(f"🔁 Incremental analysis of {vod_id}: {len(new_df)} new messages after {analyzed}")
+
+    if previous and new_df.empty:
+        return previous['personas'], previous['summaries']
+
+    result = batch_process_comments(
+        new_df, num_personas=3, token_budget=LLM_PROMPT_TOKEN_BUDGET, sample_budget=LLM_SAMPLE_BUDGET,
+        cluster_count=LLM_CLUSTER_COUNT or None, timer=timer, job=f'{platform}:{vod_id}',
+        on_plan=lambda plan: progress.update(plan=plan, batches_done=0, batches_total=plan['calls']),
+        on_batch_done=lambda done, total: progress.update(batches_done=done, batches_total=total)
+    )
+    personas = result.get("personas", [])
+    if previous:
+        personas = fold_personas(
+            previous['personas'], analyzed, personas, len(new_df),
+            all_messages=comments_df['text'].dropna().tolist()
+        )["personas"]
+
+    summaries = {
+        "overall_summary": " ".join(result.get("summaries", {}).values()),
+        "total_messages": len(comments_df),
+        "unique_users": comments_df['author_id'].nunique() if 'author_id' in comments_df.columns else "N/A"
+    }
+    if result.get("sampling"):
+        summaries["sampling"] = result["sampling"]
+    if result.get("parse_stats"):
+        summaries["llm_responses"] = result["parse_stats"]
+    if previous:
+        summaries = merge_summaries(previous['summaries'], summaries, analyzed, len(new_df))
+    return personas, summaries
+
+def fetch_twitch_video_info(vod_id):
+    vod_metadata = get_vod_metadata(vod_id)
+    if not vod_metadata:
+        raise Exception("Unable to fetch VOD metadata")
+
+    # Fix the thumbnail
+    raw_url = vod_metadata["thumbnail_url"]
+    thumbnail = raw_url.replace("%{width}", "640").replace("%{height}", "360")
+
+    # Format the stream date
+    created_at = vod_metadata.get("created_at")
+    stream_date = datetime.strptime(created_at, "%Y-%m-%dT%H:%M:%SZ").strftime("%B %d, %Y") if created_at else "Unknown"
+
+    # Build metadata
+    return {
+        "title": vod_metadata["title"],
+        "duration": vod_metadata["duration"],
+        "thumbnail": thumbnail,
+        "broadcaster": vod_metadata["user_name"],
+        "stream_date": stream_date,
+        "views": vod_metadata["view_count"],
+        "language": vod_metadata.get("language", "N/A")
+    }
 
-        save_analysis(vod_id, {
+def run_analysis_pipeline(platform, vod_id, payload, progress, download_chat, fetch_video_info):
+    """Download, analyze and save one VOD.
+
+    The metadata lookup runs alongside the chat download and must succeed
+    before analysis starts, so a bad or private VOD fails before any LLM
+    call is paid for rather than after all of them. The job still waits
+    for the download to finish before failing, so a resubmission never
+    writes the same chat file concurrently.
+    """
+    timer = StageTimer(metrics)
+    incremental = payload.get('incremental', False)
+
+    def timed(stage, fn, *args, **kwargs):
+        with timer.span(stage):
+            return fn(*args, **kwargs)
+
+    progress.update(stage='downloading')
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix=f'{platform}-prefetch') as pool:
+        metadata_future = pool.submit(timed, 'metadata', fetch_video_info, vod_id)
+        download_future = pool.submit(timed, 'download', download_chat, payload['url'], app.config['DATA_DIR'],
+                                      incremental=incremental)
+        # A metadata error propagates once the pool has waited out the download
+        video_info = metadata_future.result()
+        success, message = download_future.result()
+    if not success:
+        raise Exception(message)
+
+    # result = process_comments(comments_df)
+    personas, summaries = analyze_chat(platform, vod_id, progress, incremental=incremental, timer=timer)
+
+    progress.update(stage='uploading', uploaded=0)
+    with timer.span('upload'):
+        upload_errors = save_analysis(vod_id, {
             'personas': personas,  # Save the full LLM persona objects
             'summaries': summaries,
             'metadata': video_info
-        })
-        return redirect(url_for('show_results', vod_id=vod_id))
-    
+        }, on_upload=lambda: progress.increment('uploaded'), platform=platform)
+    if upload_errors:
+        progress.update(upload_errors=upload_errors)
+    save_timings(vod_id, timer, summaries)
+
+def run_twitch_analysis(job_id, vod_id, payload, progress):
+    run_analysis_pipeline('twitch', vod_id, payload, progress, download_twitch_chat, fetch_twitch_video_info)
+
+@app.route('/live', methods=['GET', 'POST'])
+def live():
+    if request.method == 'GET':
+        return render_template('live.html')
+    try:
+        stream_url = request.form.get('stream_url').strip()
+        live_job = f'live:{live_sessions.session_id(stream_url)}'
+        session_id = live_sessions.start(
+            stream_url,
+            analyze=lambda df: batch_process_comments(
+                df, num_personas=3, token_budget=LLM_PROMPT_TOKEN_BUDGET, sample_budget=LLM_SAMPLE_BUDGET,
+                cluster_count=LLM_CLUSTER_COUNT or None, job=live_job
+            ).get("personas", []),
+            fold=lambda personas, n, new_personas, new_n: fold_personas(personas, n, new_personas, new_n)["personas"],
+            bot_names=BOT_NAMES + KNOWN_YOUTUBE_BOTS
+        )
+        return redirect(url_for('live_dashboard', session_id=session_id))
+
     except Exception as e:
         return render_template('error.html', message=str(e))
 
+@app.route('/live/<session_id>')
+def live_dashboard(session_id):
+    snapshot = live_sessions.read_snapshot(session_id)
+    if snapshot is None:
+        return render_template('error.html', message="Live session not found")
+    return render_template('live_dashboard.html', session_id=session_id, snapshot=snapshot)
+
+@app.route('/live/<session_id>/events')
+def live_events(session_id):
+    events = live_sessions.stream_events(
+        session_id, last_event_id=request.headers.get('Last-Event-ID'), max_seconds=LIVE_SSE_SECONDS
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/live/<session_id>/stop', methods=['POST'])
+def stop_live(session_id):
+    if not live_sessions.stop(session_id):
+        return jsonify({"error": "Live session not found"}), 404
+    return redirect(url_for('live_dashboard', session_id=session_id))
+
 @app.route('/youtube')
 def youtube_form():
     return render_template('youtube.html')  # Create a simple HTML form like your Twitch form
@@ -236,48 +451,34 @@ def download_youtube():
         youtube_url = request.form.get('youtube_url').strip()
         video_id = youtube_url.split('v=')[-1].split('&')[0]
 
-        success, message = download_youtube_chat(youtube_url, app.config['DATA_DIR'])
-        if not success:
-            return render_template('error.html', message=message)
-
-        comments_path = os.path.join(app.config['DATA_DIR'], 'youtube_chat', f'{video_id}.csv')
-        comments_df = pd.read_csv(comments_path)
-        result = batch_process_comments(comments_df, batch_size=200, num_personas=3)
+        incremental = request.form.get('incremental') == '1'
 
-        personas = result.get("personas", [])
-        summaries = {
-            "overall_summary": " ".join(result.get("summaries", {}).values()),
-            "total_messages": len(comments_df),
-            "unique_users": comments_df['author_id'].nunique() if 'author_id' in comments_df.columns else "N/A"
-        }
-
-        video_metadata = get_video_metadata(video_id)
-        if not video_metadata:
-            raise Exception("Unable to fetch YouTube video metadata")
-
-        video_info = {
-            "title": video_metadata["title"],
-            "duration": video_metadata["duration"],
-            "thumbnail": video_metadata["thumbnail_url"],
-            "broadcaster": video_metadata["channel_title"],
-            "stream_date": video_metadata["published_at"],
-            "views": video_metadata["view_count"],
-            "language": video_metadata.get("language", "N/A")
-        }
-
-        save_analysis(video_id, {
-            'personas': personas,
-            'summaries': summaries,
-            'metadata': video_info
-        })
-        return redirect(url_for('show_results', vod_id=video_id))
+        job_id = job_queue.submit('youtube', video_id, {'url': youtube_url, 'incremental': incremental})
+        return redirect(url_for('show_results', vod_id=video_id, job=job_id))
 
     except Exception as e:
         return render_template('error.html', message=str(e))
 
+def fetch_youtube_video_info(video_id):
+    video_metadata = get_video_metadata(video_id)
+    if not video_metadata:
+        raise Exception("Unable to fetch YouTube video metadata")
+
+    return {
+        "title": video_metadata["title"],
+        "duration": video_metadata["duration"],
+        "thumbnail": video_metadata["thumbnail_url"],
+        "broadcaster": video_metadata["channel_title"],
+        "stream_date": video_metadata["published_at"],
+        "views": video_metadata["view_count"],
+        "language": video_metadata.get("language", "N/A")
+    }
+
+def run_youtube_analysis(job_id, video_id, payload, progress):
+    run_analysis_pipeline('youtube', video_id, payload, progress, download_youtube_chat, fetch_youtube_video_info)
+
 import os
 import json
-import requests
 from flask import request, render_template
 
 def list_supabase_metadata_files():
@@ -297,18 +498,21 @@ def list_supabase_metadata_files():
     }
 
     try:
-        response = requests.post(api_url, headers=headers, json={"prefix": "metadata/"})
+        response = http_client.post(api_url, headers=headers, json={"prefix": "metadata/"})
         response.raise_for_status()
         items = response.json()
         return [item['name'] for item in items if item['name'].endswith('_metadata.json')]
     except Exception as e:
         print(f"⚠️ Failed to list files from Supabase: {e}")
-        return []
+        return None
 
 
 
-@app.route('/compare', methods=['GET', 'POST'])
-def compare():
+def rebuild_catalog():
+    """Backfill the catalog from stored metadata files (e.g. on a fresh disk after a redeploy).
+
+    Returns False if Supabase could not be listed, so the backfill is tried again later.
+    """
     metadata_dir = os.path.join(app.config['DATA_DIR'], 'metadata')
     local_files = []
 
@@ -323,34 +527,64 @@ def compare():
     supabase_files = list_supabase_metadata_files()
 
     # Merge and deduplicate
-    all_files = sorted(set(local_files + supabase_files))
-    vod_options = []
+    all_files = sorted(set(local_files + (supabase_files or [])))
+    all_metadata = load_json_many([f'metadata/{filename}' for filename in all_files])
 
     for filename in all_files:
         vod_id = filename.replace('_metadata.json', '')
-        metadata = load_json(f'metadata/{filename}')
+        metadata = all_metadata[f'metadata/{filename}']
         if metadata:  # Ensure non-empty metadata
-            vod_options.append({
-                "id": vod_id,
-                "title": metadata.get("title", "Untitled"),
-                "broadcaster": metadata.get("broadcaster", "Unknown"),
-                "stream_date": metadata.get("stream_date", "Unknown"),
-                "label": f"{metadata.get('title', 'Untitled')} — {metadata.get('broadcaster', '')} ({metadata.get('stream_date', '')})"
-            })
+            vod_catalog.upsert(vod_id, metadata)
+    return supabase_files is not None
+
+def ensure_catalog():
+    if not vod_catalog.is_backfilled() and rebuild_catalog():
+        vod_catalog.mark_backfilled()
+
+@app.route('/api/vods')
+def list_vods():
+    query = request.args.get('q')
+    broadcaster = request.args.get('broadcaster')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+
+    ensure_catalog()
+    return jsonify({
+        "vods": vod_catalog.search(query, broadcaster, limit=per_page, offset=(page - 1) * per_page),
+        "total": vod_catalog.count(query, broadcaster),
+        "page": page,
+        "per_page": per_page
+    })
+
+@app.route('/compare', methods=['GET', 'POST'])
+def compare():
+    ensure_catalog()
+
+    selected_broadcaster = request.values.get('selected_broadcaster') or None
+    broadcasters = vod_catalog.broadcasters()
+    vod_options = vod_catalog.search(broadcaster=selected_broadcaster, limit=200) if selected_broadcaster else []
 
     if request.method == 'POST':
         vod_a = request.form.get('vod_a')
         vod_b = request.form.get('vod_b')
 
         try:
-            personas_a = load_json(f'personas/{vod_a}_personas.json')
-            personas_b = load_json(f'personas/{vod_b}_personas.json')
-            meta_a = load_json(f'metadata/{vod_a}_metadata.json')
-            meta_b = load_json(f'metadata/{vod_b}_metadata.json')
+            loaded = load_json_many([
+                f'personas/{vod_a}_personas.json',
+                f'personas/{vod_b}_personas.json',
+                f'metadata/{vod_a}_metadata.json',
+                f'metadata/{vod_b}_metadata.json'
+            ])
+            personas_a = loaded[f'personas/{vod_a}_personas.json']
+            personas_b = loaded[f'personas/{vod_b}_personas.json']
+            meta_a = loaded[f'metadata/{vod_a}_metadata.json']
+            meta_b = loaded[f'metadata/{vod_b}_metadata.json']
 
             return render_template(
                 'compare.html',
                 vod_options=vod_options,
+                broadcasters=broadcasters,
+                selected_broadcaster=selected_broadcaster,
                 vod_a=vod_a,
                 vod_b=vod_b,
                 meta_a=meta_a,
@@ -362,7 +596,8 @@ def compare():
         except FileNotFoundError as e:
             return render_template('error.html', message=f"Missing analysis file: {e}")
 
-    return render_template('compare.html', vod_options=vod_options)
+    return render_template('compare.html', vod_options=vod_options, broadcasters=broadcasters,
+                           selected_broadcaster=selected_broadcaster)
 
 def upload_to_supabase(local_path, remote_path):
     url = os.getenv("SUPABASE_URL")
@@ -372,20 +607,24 @@ def upload_to_supabase(local_path, remote_path):
     full_url = f"{url}/storage/v1/object/{bucket}/{remote_path}"
     
     with open(local_path, 'rb') as file_data:
-        res = requests.post(
-            full_url,
-            headers={
-                "apikey": key,
-                "Authorization": f"Bearer {key}",
-                "Content-Type": "application/octet-stream"
-            },
-            data=file_data
-        )
+        body = file_data.read()
+
+    res = http_client.post(
+        full_url,
+        headers={
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/octet-stream"
+        },
+        data=body
+    )
 
     if res.status_code in [200, 201]:
         print(f"Uploaded {remote_path} to Supabase.")
+        return None
     else:
         print(f"Upload failed: {res.status_code} - {res.text}")
+        return f"{res.status_code} - {res.text}"
 
 def load_json(relative_path):
     # Try local first
@@ -404,26 +643,66 @@ def load_json(relative_path):
         return {}
 
     remote_url = f"{base_url}/storage/v1/object/public/{bucket}/{relative_path}"
-    try:
-        res = requests.get(remote_url, headers={
-            "apikey": key,
-            "Authorization": f"Bearer {key}"
-        })
-        res.raise_for_status()
-        return res.json()
-    except Exception as e:
-        print(f"⚠️ Failed to fetch from Supabase: {remote_url}\n{e}")
-        return {}
+    return remote_json_cache.get(relative_path, remote_url, headers={
+        "apikey": key,
+        "Authorization": f"Bearer {key}"
+    })
+
 
+def save_analysis(vod_id, data, on_upload=None, platform=None):
+    """Write the analysis locally, then upload every file to Supabase in parallel.
 
-def save_analysis(vod_id, data):
+    Returns {remote_path: error message} for uploads that failed.
+    """
+    uploads = []
     for key in ['personas', 'summaries', 'metadata']:
         path = os.path.join(app.config['DATA_DIR'], key, f'{vod_id}_{key}.json')
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, 'w') as f:
             json.dump(data[key], f)
+        remote_json_cache.invalidate(f"{key}/{vod_id}_{key}.json")
+        uploads.append((path, f"{key}/{vod_id}_{key}.json"))
+
+    def upload(item):
+        local_path, remote_path = item
+        try:
+            error = upload_to_supabase(local_path, remote_path)
+        except Exception as e:
+            print(f"Upload failed: {remote_path} - {e}")
+            error = str(e)
+        if on_upload and not error:
+            on_upload()
+        return remote_path, error
+
+    with ThreadPoolExecutor(max_workers=STORAGE_CONCURRENCY) as pool:
+        results = list(pool.map(upload, uploads))
+
+    vod_catalog.upsert(vod_id, data['metadata'], platform=platform)
+
+    return {remote_path: error for remote_path, error in results if error}
+
+def save_timings(vod_id, timer, summaries):
+    """Write the job's stage breakdown and LLM usage next to its summaries JSON, and upload it."""
+    timings = dict(timer.summary(), llm=summaries.get('llm_responses'))
+    relative_path = f'summaries/{vod_id}_timings.json'
+    path = os.path.join(app.config['DATA_DIR'], relative_path)
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=2)
+    print(f"⏱️ Timings for {vod_id}: {timings['by_stage']}")
+    try:
+        upload_to_supabase(path, relative_path)
+    except Exception as e:
+        print(f"Upload failed: {relative_path} - {e}")
+
+def load_json_many(relative_paths):
+    """load_json for several paths at once, fetched concurrently; returns {path: data}."""
+    with ThreadPoolExecutor(max_workers=STORAGE_CONCURRENCY) as pool:
+        return dict(zip(relative_paths, pool.map(load_json, relative_paths)))
+
 
-        upload_to_supabase(path, f"{key}/{vod_id}_{key}.json")
+job_queue.register('twitch', run_twitch_analysis)
+job_queue.register('youtube', run_youtube_analysis)
+job_queue.resume_pending()
 
 
 if __name__ == '__main__':
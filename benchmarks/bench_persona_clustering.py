@@ -0,0 +1,65 @@
+"""Persona name clustering: all-pairs SequenceMatcher vs. the bigram blocking index.
+
+Usage: python -m benchmarks.bench_persona_clustering
+"""
+import random
+import time
+from difflib import SequenceMatcher
+from utils.persona_cluster import cluster_names, normalize_name
+
+WORDS = [
+    'chat', 'hype', 'the', 'critic', 'catalyst', 'lurker', 'backseat', 'strategist',
+    'supporter', 'meme', 'lord', 'fan', 'squad', 'gamer', 'analyst', 'cheer', 'leader',
+    'hater', 'newcomer', 'regular', 'emote', 'spammer', 'coach', 'clipper', 'moderator'
+]
+
+
+def all_pairs_groups(names, threshold=0.75):
+    used = set()
+    groups = []
+    for i, a in enumerate(names):
+        if i in used:
+            continue
+        group = [i]
+        for j in range(i + 1, len(names)):
+            if j not in used and SequenceMatcher(None, a, names[j]).ratio() >= threshold:
+                group.append(j)
+                used.add(j)
+        groups.append(group)
+    return groups
+
+
+def synthetic_names(n, seed=0):
+    """LLM-ish persona names pooled across batches.
+
+    Each batch reuses a slowly growing set of archetype names, sometimes with
+    an article or a one-letter variation, like real concurrent-batch output.
+    """
+    rng = random.Random(seed)
+    archetypes = [' '.join(rng.sample(WORDS, rng.randint(2, 3))).title() for _ in range(int(4 * n ** 0.5))]
+    names = []
+    for _ in range(n):
+        name = rng.choice(archetypes)
+        roll = rng.random()
+        if roll < 0.2:
+            name = 'The ' + name
+        elif roll < 0.3:
+            pos = rng.randrange(len(name))
+            name = name[:pos] + rng.choice('aeiou') + name[pos + 1:]
+        names.append(normalize_name(name))
+    return names
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f"{'n':>6} {'all-pairs (s)':>14} {'indexed (s)':>12} {'speedup':>8}  same groups")
+    for n in [250, 500, 1000, 2000, 4000]:
+        names = synthetic_names(n)
+        expected, brute_time = timed(all_pairs_groups, names)
+        actual, indexed_time = timed(cluster_names, names)
+        print(f"{n:>6} {brute_time:>14.3f} {indexed_time:>12.3f} {brute_time / indexed_time:>7.1f}x  {actual == expected}")
@@ -0,0 +1,138 @@
+"""End-to-end analysis throughput against a local stub of the OpenAI API.
+
+Replays the chats in data/twitch_chat and data/youtube_chat plus synthetic
+VODs through batch_process_comments and aggregate_personas, with no network
+or spend. Each scenario runs in a fresh process so peak RSS is its own.
+
+With --rpm/--tpm the stub enforces account limits and the pipeline runs
+behind a rate governor set to the same limits, so the 429 column shows
+whether the governor keeps calls under them.
+
+Usage: python -m benchmarks.bench_pipeline [--sizes 10000 100000] [--latency 1.0] [--failure-rate 0.02] [--rpm 60 --tpm 200000]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.stub_openai import start_stub
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+CHAT_DIRS = ['twitch_chat', 'youtube_chat']
+WORDS = [
+    'pog', 'lul', 'kekw', 'gg', 'w', 'l', 'lets', 'go', 'chat', 'that', 'was', 'insane', 'why', 'not',
+    'buy', 'armor', 'flank', 'mid', 'hi', 'everyone', 'love', 'this', 'stream', 'boring', 'play', 'clutch'
+]
+
+
+def synthetic_vod(n, hours=4, seed=0):
+    """Chat with the shape of a busy VOD: repeated short messages, a few very active chatters."""
+    rng = np.random.default_rng(seed)
+    pool = [' '.join(rng.choice(WORDS, size=rng.integers(1, 9))) for _ in range(max(n // 8, 1))]
+    return pd.DataFrame({
+        'text': [pool[i] for i in rng.integers(0, len(pool), size=n)],
+        'author_id': pd.Categorical(rng.zipf(1.6, size=n) % max(n // 20, 1)),
+        'time_in_seconds': np.sort(rng.uniform(0, hours * 3600, size=n)),
+    })
+
+
+def replay_scenarios():
+    """(name, source) for every stored chat; CSVs are read as-is, nothing is converted on disk."""
+    scenarios = []
+    for subdir in CHAT_DIRS:
+        chat_dir = os.path.join(DATA_DIR, subdir)
+        if not os.path.isdir(chat_dir):
+            continue
+        for filename in sorted(os.listdir(chat_dir)):
+            path = os.path.join(chat_dir, filename)
+            if filename.endswith('.csv'):
+                scenarios.append((f'{subdir}/{filename}', ('csv', path)))
+            elif filename.endswith('.parquet'):
+                scenarios.append((f'{subdir}/{filename}', ('parquet', path)))
+    return scenarios
+
+
+def load(source):
+    kind, value = source
+    columns = ['text', 'author_id', 'time_in_seconds']
+    if kind == 'synthetic':
+        return synthetic_vod(value)
+    if kind == 'csv':
+        from utils.chat_store import read_csv_chat
+        return read_csv_chat(value, columns=columns)
+    return pd.read_parquet(value, columns=columns)
+
+
+def run_scenario(source, base_url, metrics_dir, rpm=0, tpm=0):
+    """Runs in a child process: the OpenAI client must be built after base_url is set."""
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    os.environ['METRICS_PATH'] = os.path.join(metrics_dir, 'metrics.db')
+    os.environ['OPENAI_RATE_LIMIT_PATH'] = os.path.join(metrics_dir, 'openai_rate.db')
+    os.environ['OPENAI_RPM'], os.environ['OPENAI_TPM'] = str(rpm), str(tpm)
+
+    from config import LLM_PROMPT_TOKEN_BUDGET, LLM_SAMPLE_BUDGET
+    from utils.llm_processor_v2 import batch_process_comments
+    from utils.metrics import StageTimer
+
+    df = load(source)
+    timer = StageTimer()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # The pipeline logs every raw response
+        result = batch_process_comments(
+            df, num_personas=3, token_budget=LLM_PROMPT_TOKEN_BUDGET, sample_budget=LLM_SAMPLE_BUDGET,
+            use_cache=False, timer=timer
+        )
+    elapsed = time.perf_counter() - start
+
+    batch_seconds = [s['seconds'] for s in timer.summary()['stages'] if s['stage'] == 'llm_batch']
+    return {
+        "messages": len(df),
+        "seconds": elapsed,
+        "batches": len(batch_seconds),
+        "p50": float(np.percentile(batch_seconds, 50)) if batch_seconds else 0.0,
+        "p99": float(np.percentile(batch_seconds, 99)) if batch_seconds else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "failed_batches": result.get("parse_stats", {}).get("failed_batches", 0),
+        "personas": len(result.get("personas", [])),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10000, 100000], help='synthetic VOD sizes')
+    parser.add_argument('--no-replay', action='store_true', help='skip the stored chats in data/')
+    parser.add_argument('--latency', type=float, default=1.0, help='stub seconds per call')
+    parser.add_argument('--jitter', type=float, default=0.5)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of 500 responses')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--rpm', type=int, default=0, help='stub and governor requests per minute (0 = unlimited)')
+    parser.add_argument('--tpm', type=int, default=0, help='stub and governor tokens per minute (0 = unlimited)')
+    args = parser.parse_args()
+
+    server, stub = start_stub(latency=args.latency, jitter=args.jitter,
+                              failure_rate=args.failure_rate, rate_limit_rate=args.rate_limit_rate,
+                              rpm=args.rpm, tpm=args.tpm)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    scenarios = [] if args.no_replay else replay_scenarios()
+    scenarios += [(f'synthetic {n}', ('synthetic', n)) for n in args.sizes]
+
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'scenario':<32} {'msgs':>7} {'calls':>6} {'429':>4} {'500':>4} {'time (s)':>9} "
+          f"{'msg/s':>8} {'p50 (s)':>8} {'p99 (s)':>8} {'RSS MB':>7} {'failed':>6}")
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        for name, source in scenarios:
+            before = dict(stub.counts)
+            with ctx.Pool(1) as pool:
+                r = pool.apply(run_scenario, (source, base_url, metrics_dir, args.rpm, args.tpm))
+            calls = {key: stub.counts[key] - before[key] for key in stub.counts}
+            print(f"{name:<32} {r['messages']:>7} {calls['requests']:>6} {calls['rate_limited']:>4} "
+                  f"{calls['failed']:>4} {r['seconds']:>9.2f} {r['messages'] / r['seconds']:>8.0f} "
+                  f"{r['p50']:>8.2f} {r['p99']:>8.2f} {r['peak_rss_mb']:>7.0f} {r['failed_batches']:>6}")
+    server.shutdown()
@@ -0,0 +1,51 @@
+"""Chat sentiment: TextBlob per message vs. the batched lexicon scorer in utils.sentiment.
+
+Usage: python -m benchmarks.bench_sentiment
+"""
+import random
+import time
+import numpy as np
+from textblob import TextBlob
+from utils import sentiment
+
+WORDS = [
+    'that', 'was', 'so', 'good', 'bad', 'insane', 'play', 'chat', 'streamer', 'not', 'great',
+    'boring', 'pog', 'lul', 'kekw', 'w', 'l', 'gg', 'trash', 'love', 'this', 'game', 'why',
+    'nice', 'clutch', 'throwing', 'amazing', 'terrible', 'lol', 'hype', 'what', 'happened'
+]
+TEXTBLOB_SAMPLE = 5000
+
+
+def synthetic_chat(n, seed=0):
+    """Short, repetitive messages from a shared vocabulary, like a busy chat."""
+    rng = random.Random(seed)
+    pool = [' '.join(rng.choices(WORDS, k=rng.randint(1, 8))) for _ in range(max(n // 5, 1))]
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f"{'n':>7} {'textblob (s)':>13} {'batched (s)':>12} {'cached (s)':>11} {'speedup':>8}  agreement*")
+    for n in [10000, 100000]:
+        messages = synthetic_chat(n)
+        sentiment._cache = sentiment.SentimentCache()
+
+        # TextBlob is timed on a sample and extrapolated; it is linear per message
+        sample = messages[:TEXTBLOB_SAMPLE]
+        blob_scores, blob_time = timed(lambda msgs: [TextBlob(m).sentiment.polarity for m in msgs], sample)
+        blob_time *= n / len(sample)
+
+        scores, batched_time = timed(sentiment.score_messages, messages)
+        _, cached_time = timed(sentiment.score_messages, messages)
+
+        # *Labels on messages without chat slang, where both use the same lexicon
+        plain = np.array([not set(m.split()) & set(sentiment.CHAT_LEXICON) for m in sample])
+        agreement = np.mean(sentiment.label_polarities(np.array(blob_scores))[plain] ==
+                            sentiment.label_polarities(scores[:len(sample)])[plain])
+        print(f"{n:>7} {blob_time:>13.2f} {batched_time:>12.3f} {cached_time:>11.3f} "
+              f"{blob_time / batched_time:>7.1f}x  {agreement:.0%}")
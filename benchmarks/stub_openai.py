@@ -0,0 +1,161 @@
+"""Local stand-in for the OpenAI chat-completions API, for offline benchmarks.
+
+Every request gets a schema-valid persona response after a configurable
+latency; a configurable fraction get a 429 (with Retry-After) or a 500
+instead. With rpm/tpm set, requests beyond those per-minute limits also get a 429;
+like OpenAI, each limit is a bucket refilled continuously up to one
+minute's worth, and tokens are counted as prompt + max_tokens. Point the
+OpenAI client at it with OPENAI_BASE_URL.
+
+Usage: python -m benchmarks.stub_openai --port 8089 --latency 2.0 --rate-limit-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.batching import count_tokens
+
+PERSONAS = {
+    "personas": [
+        {
+            "name": "The Hype Squad", "description": "Reacts loudly to big moments with emotes and caps.",
+            "share": 45, "intent": "Social Engagement", "focus": "Chat-focused", "theme": "Hype",
+            "sentiment_label": "Positive", "sentiment_percent": 85,
+            "feedback": ["LETS GOOO", "PogChamp", "that was insane"],
+            "key_feedback": [{"label": "Big plays", "comments": ["PogChamp"], "recommendation": "Replay highlights."}]
+        },
+        {
+            "name": "The Backseat Strategist", "description": "Tells the streamer what to do next.",
+            "share": 35, "intent": "Influence", "focus": "Streamer-focused", "theme": "Advice",
+            "sentiment_label": "Neutral", "sentiment_percent": 60,
+            "feedback": ["buy armor", "go mid", "why not flank"],
+            "key_feedback": [{"label": "Strategy", "comments": ["go mid"], "recommendation": "Explain decisions."}]
+        },
+        {
+            "name": "The Regulars", "description": "Greets others and chats about their day.",
+            "share": 20, "intent": "Social Engagement", "focus": "Chat-focused", "theme": "Community",
+            "sentiment_label": "Positive", "sentiment_percent": 70,
+            "feedback": ["hi chat", "gn everyone", "how was work"],
+            "key_feedback": [{"label": "Belonging", "comments": ["hi chat"], "recommendation": "Greet regulars."}]
+        }
+    ]
+}
+
+
+class StubState:
+    def __init__(self, latency=1.0, jitter=0.5, failure_rate=0.0, rate_limit_rate=0.0, rpm=0, tpm=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.levels = [float(rpm), float(tpm)]
+        self.refilled_at = time.time()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "failed": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def over_limit(self, tokens):
+        """RPM/TPM bucket check; an admitted request is taken out of both buckets."""
+        if not self.rpm and not self.tpm:
+            return False
+        now = time.time()
+        with self.lock:
+            elapsed, self.refilled_at = now - self.refilled_at, now
+            requests, budget = (min(limit, level + elapsed * limit / 60)
+                                for limit, level in zip((self.rpm, self.tpm), self.levels))
+            if (self.rpm and requests < 1) or (self.tpm and budget < tokens):
+                self.levels = [requests, budget]
+                return True
+            self.levels = [requests - 1, budget - tokens]
+            return False
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random(), self.rng.uniform(-self.jitter, self.jitter)
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if not self.path.endswith('/chat/completions'):
+                return self.send_json(404, {"error": {"message": "not found"}})
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            state.count('requests')
+            roll, jitter = state.roll()
+            prompt_tokens = sum(count_tokens(m.get('content') or '') for m in request.get('messages', []))
+
+            if roll < state.rate_limit_rate or state.over_limit(prompt_tokens + (request.get('max_tokens') or 0)):
+                state.count('rate_limited')
+                return self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                      headers={"Retry-After": "0.5"})
+            if roll < state.rate_limit_rate + state.failure_rate:
+                state.count('failed')
+                return self.send_json(500, {"error": {"message": "Stub server error"}})
+
+            time.sleep(max(state.latency + jitter, 0))
+            content = json.dumps(PERSONAS)
+            completion_tokens = count_tokens(content)
+            state.count('ok')
+            self.send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get('model', 'stub'),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            })
+
+    return Handler
+
+
+def start_stub(port=0, **options):
+    """Start the stub on a background thread; returns (server, state). server.server_port has the port."""
+    state = StubState(**options)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per successful call')
+    parser.add_argument('--jitter', type=float, default=0.5, help='+/- seconds of uniform jitter')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of calls answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of calls answered with a 429')
+    parser.add_argument('--rpm', type=int, default=0, help='requests per minute before 429s (0 = unlimited)')
+    parser.add_argument('--tpm', type=int, default=0, help='tokens per minute before 429s (0 = unlimited)')
+    args = parser.parse_args()
+
+    server, _ = start_stub(args.port, latency=args.latency, jitter=args.jitter,
+                           failure_rate=args.failure_rate, rate_limit_rate=args.rate_limit_rate,
+                           rpm=args.rpm, tpm=args.tpm)
+    print(f"Stub OpenAI API on http://127.0.0.1:{server.server_port}/v1 (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
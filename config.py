@@ -4,6 +4,66 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 OPENAI_MODEL = 'gpt-4o'
+# Max number of LLM batches in flight at once (1 = sequential)
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 5))
+# Account rate limits for OPENAI_MODEL, enforced across all workers (0 = no governor)
+OPENAI_RPM = int(os.environ.get('OPENAI_RPM', 500))
+OPENAI_TPM = int(os.environ.get('OPENAI_TPM', 30000))
+OPENAI_RATE_LIMIT_PATH = os.environ.get('OPENAI_RATE_LIMIT_PATH', os.path.join(DATA_DIR, 'openai_rate.db'))
+LLM_MAX_COMPLETION_TOKENS = 3000
+# 'json_schema' (strict structured output), 'json_object', or 'none' for free text
+LLM_RESPONSE_FORMAT = os.environ.get('LLM_RESPONSE_FORMAT', 'json_schema')
+# Extra attempts for a batch whose response cannot be parsed or validated
+LLM_PARSE_RETRIES = int(os.environ.get('LLM_PARSE_RETRIES', 1))
+# Prompt tokens per LLM call when batching by token budget
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get('LLM_PROMPT_TOKEN_BUDGET', 8000))
+# Send repeated / near-duplicate chat once with a count
+LLM_COLLAPSE_DUPLICATES = os.environ.get('LLM_COLLAPSE_DUPLICATES', '1') != '0'
+# Chats above this many messages are analyzed from a stratified sample of this size
+LLM_SAMPLE_BUDGET = int(os.environ.get('LLM_SAMPLE_BUDGET', 20000))
+# Local pre-clustering: number of clusters whose exemplars go to the LLM (0 = off)
+LLM_CLUSTER_COUNT = int(os.environ.get('LLM_CLUSTER_COUNT', 0))
+# Score persona sentiment locally over the whole chat instead of trusting the model's estimate
+LOCAL_SENTIMENT = os.environ.get('LOCAL_SENTIMENT', '1') != '0'
+# USD per 1K tokens for OPENAI_MODEL, used for projected cost
+OPENAI_INPUT_COST_PER_1K = float(os.environ.get('OPENAI_INPUT_COST_PER_1K', 0.0025))
+OPENAI_OUTPUT_COST_PER_1K = float(os.environ.get('OPENAI_OUTPUT_COST_PER_1K', 0.01))
+# On-disk cache of parsed LLM responses (set LLM_CACHE_ENABLED=0 to bypass)
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', '1') != '0'
+LLM_CACHE_PATH = os.path.join(DATA_DIR, 'llm_cache.db')
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 5000))
+# Prometheus counters/histograms shared by all workers, served on /metrics
+METRICS_PATH = os.environ.get('METRICS_PATH', os.path.join(DATA_DIR, 'metrics.db'))
+# Long VODs are downloaded as up to this many concurrent time segments of at least CHAT_SEGMENT_MIN_SECONDS
+CHAT_DOWNLOAD_SEGMENTS = int(os.environ.get('CHAT_DOWNLOAD_SEGMENTS', 6))
+CHAT_SEGMENT_MIN_SECONDS = int(os.environ.get('CHAT_SEGMENT_MIN_SECONDS', 1800))
+# Background analysis threads per gunicorn worker
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# A running job that has not heartbeated for this long is treated as lost (its worker died)
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 120))
+# Default timeout (seconds) for outbound HTTP calls
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 15))
+# Retries for idempotent outbound HTTP calls on connection errors, 429 and 5xx
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 3))
+# Keep-alive connections kept per remote host
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+# Parallel Supabase uploads/downloads per request
+STORAGE_CONCURRENCY = int(os.environ.get('STORAGE_CONCURRENCY', 8))
+# Read-through cache for Supabase JSON (seconds before revalidating / retrying a miss)
+JSON_CACHE_TTL = int(os.environ.get('JSON_CACHE_TTL', 300))
+JSON_CACHE_NEGATIVE_TTL = int(os.environ.get('JSON_CACHE_NEGATIVE_TTL', 60))
+JSON_CACHE_MAX_ENTRIES = int(os.environ.get('JSON_CACHE_MAX_ENTRIES', 512))
+# Live mode: rolling window for rate/chatters, and when to refresh personas (minutes or new messages)
+LIVE_WINDOW_SECONDS = int(os.environ.get('LIVE_WINDOW_SECONDS', 300))
+LIVE_UPDATE_MINUTES = float(os.environ.get('LIVE_UPDATE_MINUTES', 5))
+LIVE_UPDATE_MESSAGES = int(os.environ.get('LIVE_UPDATE_MESSAGES', 2000))
+# Most recent messages kept for the next live persona update
+LIVE_MAX_PENDING = int(os.environ.get('LIVE_MAX_PENDING', 5000))
+# Each live SSE response ends after this long and the browser reconnects (keep below gunicorn's timeout)
+LIVE_SSE_SECONDS = int(os.environ.get('LIVE_SSE_SECONDS', 25))
+# Live sessions republish this often even when chat is quiet; three missed beats mean the owner died
+LIVE_HEARTBEAT_SECONDS = int(os.environ.get('LIVE_HEARTBEAT_SECONDS', 10))
 # MAX_COMMENTS_PER_VIDEO = 1000
 TWITCH_CLIENT_ID = os.environ.get('TWITCH_CLIENT_ID', '')
 TWITCH_CLIENT_SECRET = os.environ.get('TWITCH_CLIENT_SECRET', '')
@@ -0,0 +1,103 @@
+import json
+import math
+import re
+
+try:
+    import tiktoken
+    try:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        _encoding = None  # BPE files not cached locally and no network
+except ImportError:
+    _encoding = None
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Each message sits in the prompt as an indented JSON string plus ",\n"
+PER_MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text):
+    """Prompt tokens for text: exact with tiktoken, otherwise an offline estimate.
+
+    The estimate counts words and punctuation, charging long words roughly
+    one token per four characters and non-ASCII characters (emoji, CJK)
+    one token each. It is meant for budgeting, not billing.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece.isascii():
+            tokens += max(1, math.ceil(len(piece) / 4))
+        else:
+            tokens += len(piece)
+    return tokens
+
+
+def message_tokens(message):
+    return count_tokens(json.dumps(message)) + PER_MESSAGE_OVERHEAD
+
+
+class BatchPlan:
+    def __init__(self, batches, prompt_tokens, template_tokens, max_completion_tokens,
+                 input_cost_per_1k=0.0, output_cost_per_1k=0.0):
+        self.batches = batches
+        self.prompt_tokens = prompt_tokens
+        self.template_tokens = template_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+
+    @property
+    def calls(self):
+        return len(self.batches)
+
+    @property
+    def projected_cost(self):
+        """Upper bound in USD: every prompt token plus a full completion per call."""
+        input_tokens = self.prompt_tokens + self.template_tokens * self.calls
+        output_tokens = self.max_completion_tokens * self.calls
+        return (input_tokens * self.input_cost_per_1k + output_tokens * self.output_cost_per_1k) / 1000
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "messages": sum(len(batch) for batch in self.batches),
+            "prompt_tokens": self.prompt_tokens + self.template_tokens * self.calls,
+            "projected_cost_usd": round(self.projected_cost, 4)
+        }
+
+
+def plan_batches(comments, token_budget, template_tokens=0, max_completion_tokens=0,
+                 input_cost_per_1k=0.0, output_cost_per_1k=0.0):
+    """Pack messages, in order, into batches of at most token_budget prompt tokens.
+
+    token_budget covers the whole prompt, so the template's own tokens are
+    reserved first. A single message larger than what is left is truncated
+    rather than dropped.
+    """
+    available = max(token_budget - template_tokens, PER_MESSAGE_OVERHEAD + 1)
+    batches = []
+    batch, batch_tokens = [], 0
+    total_tokens = 0
+
+    for message in comments:
+        tokens = message_tokens(message)
+        if tokens > available:
+            # Keep the message, cut proportionally to fit
+            keep = max(1, int(len(message) * (available - PER_MESSAGE_OVERHEAD) / tokens))
+            message = message[:keep]
+            tokens = message_tokens(message)
+        if batch and batch_tokens + tokens > available:
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(message)
+        batch_tokens += tokens
+        total_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+
+    return BatchPlan(batches, total_tokens, template_tokens, max_completion_tokens,
+                     input_cost_per_1k, output_cost_per_1k)
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import time
+
+
+class VODCatalog:
+    """SQLite index of analyzed VODs for pickers and search.
+
+    save_analysis upserts a row per VOD, so listing never has to scan or
+    download the per-VOD metadata files. A one-time backfill from stored
+    metadata is recorded in the meta table, since a fresh disk may get its
+    first row from save_analysis before any backfill has run.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS vods (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    broadcaster TEXT NOT NULL,
+                    stream_date TEXT NOT NULL,
+                    platform TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS vods_broadcaster ON vods (broadcaster, updated_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS vods_updated_at ON vods (updated_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def upsert(self, vod_id, metadata, platform=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO vods (id, title, broadcaster, stream_date, platform, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET title = excluded.title, broadcaster = excluded.broadcaster, "
+                "stream_date = excluded.stream_date, platform = COALESCE(excluded.platform, vods.platform), "
+                "updated_at = excluded.updated_at",
+                (
+                    vod_id,
+                    metadata.get("title", "Untitled"),
+                    metadata.get("broadcaster", "Unknown"),
+                    metadata.get("stream_date", "Unknown"),
+                    platform,
+                    time.time()
+                )
+            )
+
+    def is_backfilled(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM meta WHERE key = 'backfilled_at'").fetchone() is not None
+
+    def mark_backfilled(self):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('backfilled_at', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(time.time()),)
+            )
+
+    def _where(self, query, broadcaster):
+        clauses, params = [], []
+        if broadcaster:
+            clauses.append("broadcaster = ?")
+            params.append(broadcaster)
+        if query:
+            clauses.append("(title LIKE ? OR broadcaster LIKE ?)")
+            params.extend([f"%{query}%", f"%{query}%"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def search(self, query=None, broadcaster=None, limit=50, offset=0):
+        where, params = self._where(query, broadcaster)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM vods{where} ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [_row_to_option(row) for row in rows]
+
+    def count(self, query=None, broadcaster=None):
+        where, params = self._where(query, broadcaster)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM vods{where}", params).fetchone()[0]
+
+    def broadcasters(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT broadcaster FROM vods ORDER BY broadcaster COLLATE NOCASE").fetchall()
+        return [row['broadcaster'] for row in rows]
+
+
+def _row_to_option(row):
+    return {
+        "id": row['id'],
+        "title": row['title'],
+        "broadcaster": row['broadcaster'],
+        "stream_date": row['stream_date'],
+        "platform": row['platform'],
+        "label": f"{row['title']} — {row['broadcaster']} ({row['stream_date']})"
+    }
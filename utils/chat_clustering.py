@@ -0,0 +1,105 @@
+import zlib
+import numpy as np
+from utils.dedup import normalize_message
+
+HASH_DIMS = 256
+
+
+def message_features(text):
+    """Word unigrams plus character trigrams of the normalized message."""
+    normalized = normalize_message(text)
+    padded = f' {normalized} '
+    return normalized.split() + [padded[i:i + 3] for i in range(max(1, len(padded) - 2))]
+
+
+def hashed_tf(messages, dims=HASH_DIMS):
+    """Signed feature-hashing term counts, one float32 row per message."""
+    tf = np.zeros((len(messages), dims), dtype=np.float32)
+    for row, text in enumerate(messages):
+        for feature in message_features(text):
+            h = zlib.crc32(feature.encode('utf-8'))
+            tf[row, h % dims] += 1.0 if (h >> 31) & 1 else -1.0
+    return tf
+
+
+def inverse_document_frequency(doc_freq, n_docs):
+    return (np.log((1 + n_docs) / (1 + np.asarray(doc_freq))) + 1).astype(np.float32)
+
+
+def tfidf(tf, idf):
+    """Sublinear TF-IDF rows, L2-normalized."""
+    vectors = np.sign(tf) * np.log1p(np.abs(tf)) * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def vectorize(messages, dims=HASH_DIMS):
+    """Hashed TF-IDF vectors (signed feature hashing), L2-normalized, as a dense float32 matrix."""
+    tf = hashed_tf(messages, dims)
+    return tfidf(tf, inverse_document_frequency(np.count_nonzero(tf, axis=0), len(messages)))
+
+
+def assign(vectors, centers, chunk_size=8192):
+    """Nearest center (cosine) per vector, computed in chunks to bound memory."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    similarity = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), chunk_size):
+        scores = vectors[start:start + chunk_size] @ centers.T
+        labels[start:start + chunk_size] = scores.argmax(axis=1)
+        similarity[start:start + chunk_size] = scores.max(axis=1)
+    return labels, similarity
+
+
+def minibatch_kmeans(vectors, k, weights=None, batch_size=1024, iterations=100, seed=0):
+    """Weighted mini-batch k-means (Sculley 2010) with per-center learning rates."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    p = None if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    centers = vectors[rng.choice(n, size=k, replace=False)].copy()
+    seen = np.zeros(k)
+
+    for _ in range(iterations):
+        batch = vectors[rng.choice(n, size=min(batch_size, n), p=p)]
+        labels, _ = assign(batch, centers)
+        for center in np.unique(labels):
+            members = batch[labels == center]
+            seen[center] += len(members)
+            rate = len(members) / seen[center]
+            centers[center] = (1 - rate) * centers[center] + rate * members.mean(axis=0)
+
+    norms = np.linalg.norm(centers, axis=1, keepdims=True)
+    return centers / np.maximum(norms, 1e-12)
+
+
+def cluster_exemplars(messages, weights, k, per_cluster=2, seed=0):
+    """Reduce messages to a few exemplars per cluster, carrying each cluster's weight.
+
+    Messages are clustered locally; each cluster is represented by the
+    per_cluster messages closest to its center, and the cluster's total
+    weight is split across them. That way the persona shares the LLM
+    estimates from exemplars still account for every message in the
+    cluster. Returns (exemplars, exemplar_weights, labels), where labels
+    maps every input message to its cluster.
+    """
+    weights = np.asarray(weights, dtype=float)
+    vectors = vectorize(messages)
+    centers = minibatch_kmeans(vectors, k, weights=weights, seed=seed)
+    labels, similarity = assign(vectors, centers)
+
+    cluster_weight = np.bincount(labels, weights=weights, minlength=k)
+    order = np.lexsort((-similarity, labels))  # by cluster, closest to center first
+    starts = np.searchsorted(labels[order], np.arange(k))
+    ends = np.searchsorted(labels[order], np.arange(k), side='right')
+
+    picks, exemplar_weights = [], []
+    for cluster in range(k):
+        members = order[starts[cluster]:ends[cluster]][:per_cluster]
+        if not len(members):
+            continue
+        share = cluster_weight[cluster] / len(members)
+        picks.extend(members.tolist())
+        exemplar_weights.extend([share] * len(members))
+
+    # Keep chat order for the prompt
+    ordered = sorted(range(len(picks)), key=lambda i: picks[i])
+    return [messages[picks[i]] for i in ordered], [exemplar_weights[i] for i in ordered], labels
@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from utils.chat_store import CHAT_SCHEMA, rows_to_table
+
+# Messages this close to a segment boundary may be returned by both neighbouring segments
+BOUNDARY_SLACK_SECONDS = 2
+
+
+def to_row(message):
+    author = message.get('author', {}) or {}
+    author_id = author.get('id')
+    return {
+        'message_id': message.get('message_id'),
+        'text': message.get('message'),
+        'timestamp': message.get('timestamp'),
+        'time_in_seconds': message.get('time_in_seconds'),
+        'author_name': author.get('name'),
+        'author_id': str(author_id) if author_id is not None else None
+    }
+
+
+def is_bot_or_anonymous(row, bot_names):
+    if row['author_id'] is None or row['author_id'] == '':
+        return True
+    return (row['author_name'] or '').lower() in bot_names
+
+
+def iter_chat_chunks(chat, bot_names, chunk_size=1000, skip_ids=None):
+    """Yield lists of at most chunk_size filtered rows as messages arrive."""
+    bot_names = {name.lower() for name in bot_names}
+    chunk = []
+    for message in chat:
+        row = to_row(message)
+        if is_bot_or_anonymous(row, bot_names):
+            continue
+        if skip_ids and row['message_id'] in skip_ids:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_chat_to_parquet(chat, output_path, bot_names, chunk_size=5000):
+    """Filter and write chat messages to Parquet as they arrive, one row group per chunk.
+
+    Only chunk_size rows are held in memory at a time, so memory use stays
+    flat regardless of VOD length. Rows go to a temporary file that replaces
+    output_path once the stream is exhausted, so readers never see a
+    partial file. Returns the number of messages written.
+    """
+    tmp_path = f'{output_path}.part'
+    written = 0
+
+    try:
+        with pq.ParquetWriter(tmp_path, CHAT_SCHEMA) as writer:
+            for chunk in iter_chat_chunks(chat, bot_names, chunk_size):
+                writer.write_table(rows_to_table(chunk))
+                written += len(chunk)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, output_path)
+    return written
+
+
+def append_chat_to_parquet(chat, output_path, bot_names, skip_ids=None, chunk_size=5000):
+    """Append newly fetched messages to an existing chat file.
+
+    The stored row groups are copied over as-is and the new messages
+    follow them, so rows keep arrival order and the new ones are simply the
+    tail of the file. Messages whose id is in skip_ids (the ones at the
+    resume point) are dropped. Returns the number of messages appended.
+    """
+    tmp_path = f'{output_path}.part'
+    written = 0
+
+    try:
+        with pq.ParquetWriter(tmp_path, CHAT_SCHEMA) as writer:
+            existing = pq.ParquetFile(output_path)
+            for group in range(existing.num_row_groups):
+                writer.write_table(existing.read_row_group(group).cast(CHAT_SCHEMA))
+            for chunk in iter_chat_chunks(chat, bot_names, chunk_size, skip_ids=skip_ids):
+                writer.write_table(rows_to_table(chunk))
+                written += len(chunk)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, output_path)
+    return written
+
+
+def plan_segments(duration, max_segments, min_segment_seconds):
+    """Split [0, duration] seconds into up to max_segments ranges of at least min_segment_seconds."""
+    if not duration or max_segments <= 1:
+        return [(None, None)]
+    count = int(min(max_segments, max(1, duration // min_segment_seconds)))
+    if count <= 1:
+        return [(None, None)]
+    edges = [round(duration * i / count, 3) for i in range(count + 1)]
+    return [(edges[i], edges[i + 1]) for i in range(count)]
+
+
+def stream_segments_to_parquet(open_chat, ranges, output_path, bot_names, max_workers=None, chunk_size=5000):
+    """Download time ranges of a VOD's chat concurrently into one Parquet file.
+
+    open_chat(start, end) returns a chat iterator for that range. Each
+    segment streams into its own part file, then the parts are concatenated
+    in range order. That keeps timestamp order without a sort, and only
+    messages near a boundary are checked against the previous segment for
+    duplicates by message_id. Returns the number of messages written.
+    """
+    part_paths = [f'{output_path}.seg{i}' for i in range(len(ranges))]
+    tmp_path = f'{output_path}.part'
+    written = 0
+
+    def fetch(index):
+        start, end = ranges[index]
+        return stream_chat_to_parquet(open_chat(start, end), part_paths[index], bot_names, chunk_size)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or len(ranges)) as pool:
+            list(pool.map(fetch, range(len(ranges))))
+
+        with pq.ParquetWriter(tmp_path, CHAT_SCHEMA) as writer:
+            previous_tail = set()
+            for (_, end), part_path in zip(ranges, part_paths):
+                tail = set()
+                part = pq.ParquetFile(part_path)
+                for group in range(part.num_row_groups):
+                    table = part.read_row_group(group).cast(CHAT_SCHEMA)
+                    if previous_tail:
+                        seen = pc.fill_null(pc.is_in(table['message_id'], value_set=pa.array(list(previous_tail))), False)
+                        table = table.filter(pc.invert(seen))
+                    near_end = pc.greater_equal(table['time_in_seconds'], end - BOUNDARY_SLACK_SECONDS)
+                    tail.update(v for v in table.filter(near_end)['message_id'].to_pylist() if v is not None)
+                    writer.write_table(table)
+                    written += table.num_rows
+                previous_tail = tail
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    os.replace(tmp_path, output_path)
+    return written
@@ -0,0 +1,112 @@
+import os
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Typed, columnar layout for downloaded chat. Author ids repeat heavily,
+# so they are dictionary-encoded (read back as a pandas categorical).
+CHAT_SCHEMA = pa.schema([
+    ('message_id', pa.string()),
+    ('text', pa.string()),
+    ('timestamp', pa.int64()),
+    ('time_in_seconds', pa.float64()),
+    ('author_name', pa.string()),
+    ('author_id', pa.dictionary(pa.int32(), pa.string())),
+])
+
+CSV_DTYPES = {
+    'message_id': 'string',
+    'text': 'string',
+    'timestamp': 'Int64',
+    'time_in_seconds': 'float64',
+    'author_name': 'string',
+    'author_id': 'string',
+}
+
+PLATFORM_DIRS = {
+    'twitch': 'twitch_chat',
+    'youtube': 'youtube_chat',
+}
+
+
+def chat_path(data_dir, platform, vod_id, ext='parquet'):
+    return os.path.join(data_dir, PLATFORM_DIRS[platform], f'{vod_id}.{ext}')
+
+
+def rows_to_table(rows):
+    return pa.Table.from_pylist(rows, schema=CHAT_SCHEMA)
+
+
+def read_csv_chat(csv_path, columns=None):
+    usecols = columns if columns else None
+    df = pd.read_csv(csv_path, usecols=usecols, dtype={k: v for k, v in CSV_DTYPES.items() if not usecols or k in usecols})
+    if 'author_id' in df.columns:
+        df['author_id'] = df['author_id'].astype('category')
+    return df
+
+
+def convert_csv_to_parquet(csv_path, parquet_path=None):
+    parquet_path = parquet_path or os.path.splitext(csv_path)[0] + '.parquet'
+    df = read_csv_chat(csv_path)
+    table = pa.Table.from_pandas(df, schema=CHAT_SCHEMA, preserve_index=False)
+    tmp_path = f'{parquet_path}.part'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, parquet_path)
+    return parquet_path
+
+
+def read_chat(data_dir, platform, vod_id, columns=None):
+    """Load a VOD's chat, reading only the requested columns.
+
+    Parquet files are memory-mapped. Legacy CSV downloads are still
+    readable and get converted to Parquet on first access.
+    """
+    parquet_path = chat_path(data_dir, platform, vod_id)
+    if not os.path.exists(parquet_path):
+        csv_path = chat_path(data_dir, platform, vod_id, ext='csv')
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"No chat found for {platform} VOD {vod_id}")
+        try:
+            convert_csv_to_parquet(csv_path, parquet_path)
+        except Exception as e:
+            print(f"⚠️ Could not convert {csv_path} to Parquet, reading CSV: {e}")
+            return read_csv_chat(csv_path, columns=columns)
+
+    return pd.read_parquet(parquet_path, columns=columns, memory_map=True)
+
+
+def chat_cursor(parquet_path):
+    """Where a stored chat ends: row count, last time_in_seconds and the message ids at that time.
+
+    Returns None when nothing has been stored yet. A refresh resumes at
+    last_time and skips boundary_ids, which were already ingested.
+    """
+    if not os.path.exists(parquet_path):
+        return None
+    table = pq.read_table(parquet_path, columns=['message_id', 'time_in_seconds'])
+    if table.num_rows == 0:
+        return {"rows": 0, "last_time": None, "boundary_ids": set()}
+    df = table.to_pandas()
+    last_time = df['time_in_seconds'].max()
+    return {
+        "rows": table.num_rows,
+        "last_time": None if pd.isna(last_time) else float(last_time),
+        "boundary_ids": set(df.loc[df['time_in_seconds'] == last_time, 'message_id'].dropna())
+    }
+
+
+def convert_all(data_dir):
+    for platform, subdir in PLATFORM_DIRS.items():
+        chat_dir = os.path.join(data_dir, subdir)
+        if not os.path.isdir(chat_dir):
+            continue
+        for filename in sorted(os.listdir(chat_dir)):
+            if filename.endswith('.csv'):
+                path = convert_csv_to_parquet(os.path.join(chat_dir, filename))
+                print(f"Converted {filename} -> {os.path.basename(path)}")
+
+
+if __name__ == '__main__':
+    # Usage: python -m utils.chat_store [data_dir]
+    convert_all(sys.argv[1] if len(sys.argv) > 1 else 'data')
@@ -0,0 +1,109 @@
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+
+_REPEATED_CHARS = re.compile(r'(.)\1{2,}')
+_WHITESPACE = re.compile(r'\s+')
+_EDGE_PUNCTUATION = re.compile(r'^[^\w]+|[^\w]+$')
+
+# MinHash parameters: 8 bands x 4 rows puts the LSH candidate cut-off
+# around Jaccard 0.6, comfortably below the 0.8 verification threshold
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+
+def normalize_message(text):
+    """Canonical form for duplicate detection: case, spacing, stretched letters and repeated words."""
+    text = _WHITESPACE.sub(' ', str(text).lower()).strip()
+    text = _REPEATED_CHARS.sub(r'\1\1', text)  # "noooooo" -> "noo"
+    words = []
+    for word in text.split(' '):
+        if not words or word != words[-1]:  # "LUL LUL LUL" -> "lul"
+            words.append(word)
+    return _EDGE_PUNCTUATION.sub('', ' '.join(words)) or text
+
+
+def shingles(text, k=3):
+    padded = f' {text} '
+    return {padded[i:i + k] for i in range(max(1, len(padded) - k + 1))}
+
+
+def minhash(shingle_set):
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    # (a * h + b) mod p for every permutation at once; values stay below 2^63
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % np.uint64(_MERSENNE_PRIME)
+    return permuted.min(axis=0)
+
+
+class CollapsedMessages:
+    """Unique message representatives with how many raw messages each stands for (summed weights if weighted)."""
+
+    def __init__(self, representatives, counts, assignments):
+        self.representatives = representatives
+        self.counts = counts
+        self.assignments = assignments  # raw message index -> representative index
+
+    def __len__(self):
+        return len(self.representatives)
+
+    @property
+    def total(self):
+        return int(round(sum(self.counts)))
+
+
+def collapse_messages(messages, threshold=0.8, weights=None):
+    """Collapse exact and near-duplicate messages, keeping first-seen order.
+
+    Exact duplicates are grouped by normalized text. Each new normalized
+    form is then checked against existing representatives through MinHash
+    LSH buckets and joins the first one whose shingle Jaccard similarity
+    reaches threshold; otherwise it becomes a representative itself.
+    With weights (e.g. sampling weights), counts are the summed weights of
+    the messages each representative stands for instead of row counts.
+    """
+    representatives, counts = [], []
+    rep_shingles = []
+    by_normalized = {}
+    buckets = defaultdict(list)
+    assignments = np.empty(len(messages), dtype=np.int64)
+
+    for idx, message in enumerate(messages):
+        normalized = normalize_message(message)
+        rep = by_normalized.get(normalized)
+
+        if rep is None:
+            shingle_set = shingles(normalized)
+            signature = minhash(shingle_set)
+            band_keys = [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+            candidates = sorted({c for key in band_keys for c in buckets.get(key, ())})
+            for candidate in candidates:
+                other = rep_shingles[candidate]
+                if len(shingle_set & other) >= threshold * len(shingle_set | other):
+                    rep = candidate
+                    break
+
+            if rep is None:
+                rep = len(representatives)
+                representatives.append(message)
+                counts.append(0)
+                rep_shingles.append(shingle_set)
+                for key in band_keys:
+                    buckets[key].append(rep)
+            by_normalized[normalized] = rep
+
+        counts[rep] += weights[idx] if weights is not None else 1
+        assignments[idx] = rep
+
+    return CollapsedMessages(representatives, counts, assignments)
+
+
+def format_weighted(message, count):
+    """Prompt form of a representative: "(×N) text" when it stands for several messages."""
+    return f"(×{count}) {message}" if count > 1 else message
@@ -0,0 +1,56 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import HTTP_TIMEOUT, HTTP_RETRIES, HTTP_POOL_SIZE
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """Session that applies a default timeout to every request."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _build_session(timeout, retries, pool_size):
+    session = TimeoutSession(timeout)
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # Never replay a POST, e.g. a Supabase upload
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(url):
+    """Keep-alive session shared by every caller talking to url's host."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = _build_session(HTTP_TIMEOUT, HTTP_RETRIES, HTTP_POOL_SIZE)
+        return session
+
+
+def get(url, **kwargs):
+    return get_session(url).get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session(url).post(url, **kwargs)
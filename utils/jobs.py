@@ -0,0 +1,218 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Job lifecycle: queued -> running -> done | failed
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """SQLite-backed job queue drained by a local thread pool.
+
+    Job state lives in SQLite so any gunicorn worker can answer status
+    requests, while the work itself runs on the pool of the worker that
+    accepted (or later claimed) the job.
+
+    At most one job per (kind, vod_id) is queued or running at a time:
+    submitting a VOD that is already in flight returns the existing job's
+    id instead of starting a second download and analysis. Running jobs
+    heartbeat their updated_at; one whose worker died is marked failed
+    after lease_seconds, whether it is next read, resubmitted or found by
+    resume_pending.
+    """
+
+    def __init__(self, db_path, max_workers=2, lease_seconds=120):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.handlers = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    vod_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_vod_id ON jobs (vod_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_in_flight ON jobs (kind, vod_id, status)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def register(self, kind, handler):
+        """Register handler(job_id, vod_id, payload, progress) for a job kind."""
+        self.handlers[kind] = handler
+
+    def submit(self, kind, vod_id, payload):
+        """Queue a job and return its id, or the id of the job already in flight for this VOD."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers
+            # cannot both see "nothing in flight" and insert
+            conn.execute("BEGIN IMMEDIATE")
+            existing = self._in_flight(conn, kind, vod_id, now)
+            if existing:
+                conn.rollback()
+                print(f"🔗 {kind} {vod_id} is already being analyzed, attaching to job {existing}")
+                return existing
+            conn.execute(
+                "INSERT INTO jobs (id, kind, vod_id, payload, status, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, vod_id, json.dumps(payload), QUEUED, json.dumps({"stage": QUEUED}), now, now)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def _in_flight(self, conn, kind, vod_id, now):
+        """Id of the live job for this VOD, after expiring lost ones. Call inside a write transaction."""
+        self._expire(conn, now, "kind = ? AND vod_id = ?", (kind, vod_id))
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE kind = ? AND vod_id = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+            (kind, vod_id, QUEUED, RUNNING)
+        ).fetchone()
+        return row['id'] if row else None
+
+    def _expire(self, conn, now, where="1", params=()):
+        """Fail running jobs whose heartbeat stopped (their worker died), among those matching where.
+
+        Queued jobs have no heartbeat; they wait for a pool slot or for resume_pending.
+        """
+        conn.execute(
+            f"UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+            f"WHERE status = ? AND updated_at < ? AND {where}",
+            (FAILED, "Worker stopped responding", now, RUNNING, now - self.lease_seconds) + tuple(params)
+        )
+
+    def resume_pending(self):
+        """Dispatch jobs left queued by a previous process (e.g. after a restart); fail lost running ones."""
+        with self._connect() as conn:
+            self._expire(conn, time.time())
+            rows = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)).fetchall()
+        for row in rows:
+            self.executor.submit(self._run, row['id'])
+
+    def _claim(self, job_id):
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+            return cur.rowcount == 1
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return  # Already picked up by another worker
+        job = self.get(job_id)
+        handler = self.handlers.get(job['kind'])
+        progress = JobProgress(self, job_id)
+        stop_heartbeat = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, stop_heartbeat), daemon=True).start()
+        try:
+            if handler is None:
+                raise Exception(f"No handler registered for job kind '{job['kind']}'")
+            handler(job_id, job['vod_id'], job['payload'], progress)
+            progress.update(stage=DONE)
+            self._set_status(job_id, DONE)
+        except Exception as e:
+            print(f"❌ Job {job_id} ({job['kind']} {job['vod_id']}) failed: {e}")
+            progress.update(stage=FAILED)
+            self._set_status(job_id, FAILED, error=str(e))
+        finally:
+            stop_heartbeat.set()
+
+    def _heartbeat(self, job_id, stop):
+        """Keep the running job's lease fresh through long stages that report no progress."""
+        while not stop.wait(self.lease_seconds / 4):
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?",
+                        (time.time(), job_id, RUNNING)
+                    )
+            except sqlite3.Error as e:
+                print(f"⚠️ Heartbeat failed for job {job_id}: {e}")
+
+    def _set_status(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def _set_progress(self, job_id, progress):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            self._expire(conn, time.time(), "id = ?", (job_id,))
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def latest_for_vod(self, vod_id):
+        with self._connect() as conn:
+            self._expire(conn, time.time(), "vod_id = ?", (vod_id,))
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE vod_id = ? ORDER BY created_at DESC LIMIT 1", (vod_id,)
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+
+class JobProgress:
+    """Thread-safe progress reporter handed to job handlers."""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.state = {"stage": RUNNING}
+        self.lock = threading.Lock()
+
+    def update(self, **fields):
+        with self.lock:
+            self.state.update(fields)
+            self.queue._set_progress(self.job_id, self.state)
+
+    def increment(self, field, amount=1):
+        with self.lock:
+            self.state[field] = self.state.get(field, 0) + amount
+            self.queue._set_progress(self.job_id, self.state)
+
+
+def _row_to_job(row):
+    return {
+        "id": row['id'],
+        "kind": row['kind'],
+        "vod_id": row['vod_id'],
+        "payload": json.loads(row['payload']),
+        "status": row['status'],
+        "progress": json.loads(row['progress']),
+        "error": row['error'],
+        "created_at": row['created_at'],
+        "updated_at": row['updated_at'],
+    }
@@ -0,0 +1,115 @@
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from utils import http_client
+
+
+class RemoteJSONCache:
+    """Read-through cache for JSON objects fetched over HTTP.
+
+    Tiers: an in-process LRU, then a write-back copy on disk under cache_dir
+    (with its ETag), then the network. Entries younger than ttl are served
+    without any request; older ones are revalidated with If-None-Match, so an
+    unchanged object costs a 304 with no body. Missing objects (404/400) are
+    remembered for negative_ttl. If revalidation fails, the stale copy is
+    served rather than nothing.
+    """
+
+    def __init__(self, cache_dir, ttl=300, negative_ttl=60, max_entries=512):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _disk_paths(self, relative_path):
+        data_path = os.path.join(self.cache_dir, relative_path)
+        return data_path, f'{data_path}.meta'
+
+    def _remember(self, relative_path, entry):
+        with self.lock:
+            self.entries[relative_path] = entry
+            self.entries.move_to_end(relative_path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _lookup(self, relative_path):
+        with self.lock:
+            entry = self.entries.get(relative_path)
+            if entry:
+                self.entries.move_to_end(relative_path)
+                return entry
+
+        data_path, meta_path = self._disk_paths(relative_path)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(data_path, 'r') as f:
+                entry = {"data": json.load(f), "etag": meta.get("etag"), "fetched_at": meta["fetched_at"], "missing": False}
+        except (OSError, ValueError, KeyError):
+            return None
+        self._remember(relative_path, entry)
+        return entry
+
+    def _write_back(self, relative_path, entry):
+        data_path, meta_path = self._disk_paths(relative_path)
+        try:
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            for path, payload in [(data_path, entry["data"]), (meta_path, {"etag": entry["etag"], "fetched_at": entry["fetched_at"]})]:
+                tmp_path = f'{path}.part'
+                with open(tmp_path, 'w') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write cache file for {relative_path}: {e}")
+
+    def invalidate(self, relative_path):
+        with self.lock:
+            self.entries.pop(relative_path, None)
+        for path in self._disk_paths(relative_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get(self, relative_path, remote_url, headers=None):
+        """The object at remote_url, as a copy the caller is free to modify."""
+        return copy.deepcopy(self._get(relative_path, remote_url, headers))
+
+    def _get(self, relative_path, remote_url, headers=None):
+        now = time.time()
+        entry = self._lookup(relative_path)
+        if entry:
+            max_age = self.negative_ttl if entry["missing"] else self.ttl
+            if now - entry["fetched_at"] < max_age:
+                return entry["data"]
+
+        request_headers = dict(headers or {})
+        if entry and entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+
+        try:
+            res = http_client.get(remote_url, headers=request_headers)
+            if res.status_code == 304 and entry:
+                entry = dict(entry, fetched_at=now)
+                self._remember(relative_path, entry)
+                self._write_back(relative_path, entry)
+                return entry["data"]
+            if res.status_code in (400, 404):
+                # Supabase answers 400 for some missing objects
+                print(f"⚠️ Not found in Supabase: {remote_url}")
+                self._remember(relative_path, {"data": {}, "etag": None, "fetched_at": now, "missing": True})
+                return {}
+            res.raise_for_status()
+            entry = {"data": res.json(), "etag": res.headers.get("ETag"), "fetched_at": now, "missing": False}
+        except Exception as e:
+            print(f"⚠️ Failed to fetch from Supabase: {remote_url}\n{e}")
+            if entry and not entry["missing"]:
+                return entry["data"]  # stale beats nothing
+            return {}
+
+        self._remember(relative_path, entry)
+        self._write_back(relative_path, entry)
+        return entry["data"]
@@ -0,0 +1,410 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+import pandas as pd
+from chat_downloader import ChatDownloader
+from utils.chat_ingest import to_row, is_bot_or_anonymous
+
+LIVE = 'live'
+ENDED = 'ended'
+STOPPED = 'stopped'
+FAILED = 'failed'
+MISSED_HEARTBEATS = 3  # A live snapshot this many heartbeats old belongs to a dead worker
+
+
+class RollingWindow:
+    """Message rate and unique chatters over the last window_seconds.
+
+    Messages are tallied into bucket_seconds slots and slots older than the
+    window are dropped as new ones arrive, so memory depends on the window
+    and on chatters per slot, not on how long the stream has been running.
+    """
+
+    def __init__(self, window_seconds=300, bucket_seconds=10):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.slots = deque()  # [slot id, message count, author ids]
+
+    def add(self, seconds, author_id):
+        slot = int(seconds // self.bucket_seconds)
+        if self.slots and self.slots[-1][0] == slot:
+            self.slots[-1][1] += 1
+            self.slots[-1][2].add(author_id)
+        else:
+            self.slots.append([slot, 1, {author_id}])
+        self._evict(slot)
+
+    def _evict(self, current_slot):
+        oldest = current_slot - max(1, self.window_seconds // self.bucket_seconds)
+        while self.slots and self.slots[0][0] <= oldest:
+            self.slots.popleft()
+
+    def snapshot(self, now_seconds):
+        self._evict(int(now_seconds // self.bucket_seconds))
+        messages = sum(count for _, count, _ in self.slots)
+        chatters = set().union(*(authors for _, _, authors in self.slots)) if self.slots else set()
+        return {
+            "window_seconds": self.window_seconds,
+            "messages": messages,
+            "messages_per_minute": round(messages * 60 / self.window_seconds, 1),
+            "unique_chatters": len(chatters),
+        }
+
+
+class VolumeHistory:
+    """Per-bucket message counts since the stream started, in bucketize_chat's format.
+
+    Only the last max_buckets are kept (a 12h stream at 1-minute buckets by default).
+    """
+
+    def __init__(self, bucket_minutes=1, max_buckets=720):
+        self.width = bucket_minutes * 60
+        self.buckets = deque(maxlen=max_buckets)  # [bucket id, count, first message index]
+
+    def add(self, elapsed_seconds, index):
+        bucket = int(elapsed_seconds // self.width)
+        if self.buckets and self.buckets[-1][0] == bucket:
+            self.buckets[-1][1] += 1
+        else:
+            self.buckets.append([bucket, 1, index])
+
+    def to_list(self):
+        return [
+            {"time": str(timedelta(seconds=bucket * self.width)), "count": count, "first_index": first, "theme": None}
+            for bucket, count, first in self.buckets
+        ]
+
+
+class LiveSession:
+    """Follows one live stream's chat and keeps rolling aggregates and personas.
+
+    Chat is consumed as a generator on a background thread. Messages waiting
+    for the next persona update sit in a bounded buffer; an update runs once
+    update_minutes have passed or update_messages have arrived, on its own
+    thread so ingest never stalls, and its personas are folded into the
+    running ones by message count. Every change is written to a snapshot
+    file, which is what SSE handlers in any worker stream from. The snapshot
+    is also republished every heartbeat_seconds while chat is quiet, which
+    renews the session's lease and tells readers the session is alive.
+    """
+
+    def __init__(self, session_id, url, snapshot_path, analyze, fold, bot_names=(), leases=None,
+                 heartbeat_seconds=10, window_seconds=300, update_minutes=5, update_messages=2000,
+                 max_pending=5000):
+        self.session_id = session_id
+        self.url = url
+        self.snapshot_path = snapshot_path
+        self.leases = leases
+        self.heartbeat_seconds = heartbeat_seconds
+        self.analyze = analyze  # DataFrame of new messages -> personas
+        self.fold = fold  # (personas, n, new personas, new n) -> personas
+        self.bot_names = {name.lower() for name in bot_names}
+        self.update_seconds = update_minutes * 60
+        self.update_messages = update_messages
+
+        self.window = RollingWindow(window_seconds)
+        self.history = VolumeHistory()
+        self.pending = deque(maxlen=max_pending)
+        self.pending_count = 0
+        self.total = 0
+        self.analyzed = 0
+        self.personas = []
+        self.updates = 0
+        self.status = LIVE
+        self.error = None
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()
+        self.owned = True  # Cleared if another worker takes the lease over; we stop writing then
+        self.analysis_thread = None
+        self.started_at = time.time()
+        self.last_update = self.started_at
+        self.last_publish = 0.0
+        self.thread = threading.Thread(target=self.run, name=f'live-{session_id}', daemon=True)
+
+    def start(self):
+        if os.path.exists(self.stop_path):
+            os.remove(self.stop_path)
+        self.publish(force=True)
+        self.thread.start()
+        threading.Thread(target=self.keep_alive, name=f'live-{self.session_id}-heartbeat', daemon=True).start()
+        return self
+
+    @property
+    def stop_path(self):
+        return f'{self.snapshot_path}.stop'
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        try:
+            chat = ChatDownloader().get_chat(self.url)
+            for message in chat:
+                if self.stop_event.is_set():
+                    self.status = STOPPED
+                    break
+                self.ingest(message)
+            else:
+                self.finish_updates()
+                self.status = ENDED
+        except Exception as e:
+            print(f"❌ Live session {self.session_id} failed: {e}")
+            self.status, self.error = FAILED, str(e)
+        self.finished.set()
+        self.publish(force=True)
+        if self.leases and self.owned:
+            self.leases.release(self.session_id)
+
+    def keep_alive(self):
+        """Renew the lease and republish every heartbeat until the session finishes."""
+        while not self.finished.wait(self.heartbeat_seconds):
+            if self.leases and not self.leases.renew(self.session_id):
+                print(f"⚠️ Live session {self.session_id} lost its lease to another worker; stopping")
+                self.owned = False
+                self.stop_event.set()
+                return
+            self.publish(force=True)
+
+    def ingest(self, message):
+        row = to_row(message)
+        if is_bot_or_anonymous(row, self.bot_names):
+            return
+        now = time.time()
+        with self.lock:
+            self.window.add(now, row['author_id'])
+            self.history.add(now - self.started_at, self.total)
+            self.pending.append(row['text'] or '')
+            self.pending_count += 1
+            self.total += 1
+        if self.update_due(now):
+            self.start_update(now)
+        self.publish()
+
+    def update_due(self, now):
+        if not self.pending_count or (self.analysis_thread and self.analysis_thread.is_alive()):
+            return False
+        return self.pending_count >= self.update_messages or now - self.last_update >= self.update_seconds
+
+    def start_update(self, now):
+        with self.lock:
+            # pending holds at most max_pending messages; the count still covers all of them
+            messages, count = list(self.pending), self.pending_count
+            self.pending.clear()
+            self.pending_count = 0
+            self.last_update = now
+        self.analysis_thread = threading.Thread(target=self.update_personas, args=(messages, count), daemon=True)
+        self.analysis_thread.start()
+
+    def finish_updates(self):
+        """Analyze whatever chat arrived after the last update once the stream is over."""
+        if self.analysis_thread:
+            self.analysis_thread.join()
+        if self.pending_count:
+            self.start_update(time.time())
+            self.analysis_thread.join()
+
+    def update_personas(self, messages, count):
+        try:
+            new_personas = self.analyze(pd.DataFrame({'text': messages}))
+        except Exception as e:
+            print(f"⚠️ Live persona update failed for {self.session_id}: {e}")
+            return
+        with self.lock:
+            self.personas = self.fold(self.personas, self.analyzed, new_personas, count) if self.personas else new_personas
+            self.analyzed += count
+            self.updates += 1
+        self.publish(force=True)
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            return {
+                "session": self.session_id,
+                "url": self.url,
+                "status": self.status,
+                "error": self.error,
+                "messages": self.total,
+                "window": self.window.snapshot(now),
+                "timeline": self.history.to_list(),
+                "personas": self.personas,
+                "persona_updates": self.updates,
+                "analyzed_messages": self.analyzed,
+                "pending_messages": self.pending_count,
+                "updated_at": now,
+            }
+
+    def publish(self, force=False, min_interval=1.0):
+        """Write the snapshot atomically, at most once per min_interval unless forced."""
+        now = time.time()
+        if not self.owned or (not force and now - self.last_publish < min_interval):
+            return
+        self.last_publish = now
+        if os.path.exists(self.stop_path):  # Stop requested through another worker
+            self.stop_event.set()
+        tmp_path = f'{self.snapshot_path}.{threading.get_ident()}.part'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, default=str)
+        os.replace(tmp_path, self.snapshot_path)
+
+
+class LiveLeases:
+    """Which process follows each live session, shared by every gunicorn worker.
+
+    Leases live in a SQLite table next to the snapshots and expire after
+    ttl seconds unless the owner renews them, so a session whose worker
+    died can be started again by another one.
+    """
+
+    def __init__(self, db_path, ttl):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.token = uuid.uuid4().hex[:8]
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    session_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @property
+    def owner(self):
+        # The pid tells apart workers forked from one preloaded app
+        return f'{os.getpid()}-{self.token}'
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def acquire(self, session_id):
+        """Take the lease unless another process holds an unexpired one."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE session_id = ?", (session_id,)).fetchone()
+            if row and row['owner'] != self.owner and row['expires_at'] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT INTO leases (session_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                (session_id, self.owner, now + self.ttl)
+            )
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, session_id):
+        """Extend our lease; False if it expired and another process took it."""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE session_id = ? AND owner = ?",
+                (time.time() + self.ttl, session_id, self.owner)
+            ).rowcount > 0
+
+    def release(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE session_id = ? AND owner = ?", (session_id, self.owner))
+
+
+class LiveRegistry:
+    """Live sessions, one per stream URL, each followed by the worker holding its lease."""
+
+    def __init__(self, snapshot_dir, heartbeat_seconds=10, **session_options):
+        self.snapshot_dir = snapshot_dir
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = heartbeat_seconds * MISSED_HEARTBEATS
+        self.session_options = session_options
+        self.sessions = {}
+        self.lock = threading.Lock()
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self.leases = LiveLeases(os.path.join(snapshot_dir, 'leases.db'), ttl=self.stale_seconds)
+
+    @staticmethod
+    def session_id(url):
+        return hashlib.sha1(url.strip().encode('utf-8')).hexdigest()[:12]
+
+    def snapshot_path(self, session_id):
+        return os.path.join(self.snapshot_dir, f'{session_id}.json')
+
+    def start(self, url, analyze, fold, bot_names=()):
+        """Follow the stream, or attach to it if this or another worker already does."""
+        session_id = self.session_id(url)
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session and session.status == LIVE and session.owned:
+                return session_id
+            if not self.leases.acquire(session_id):
+                return session_id
+            self.sessions[session_id] = LiveSession(
+                session_id, url, self.snapshot_path(session_id), analyze, fold, bot_names=bot_names,
+                leases=self.leases, heartbeat_seconds=self.heartbeat_seconds, **self.session_options
+            ).start()
+        return session_id
+
+    def stop(self, session_id):
+        """Ask a session to stop, whichever worker runs it (it checks for the marker on publish)."""
+        if not os.path.exists(self.snapshot_path(session_id)):
+            return False
+        session = self.sessions.get(session_id)
+        if session:
+            session.stop()
+        else:
+            open(f'{self.snapshot_path(session_id)}.stop', 'w').close()
+        return True
+
+    def read_snapshot(self, session_id):
+        """The latest snapshot; a live one that missed its heartbeats is reported as failed."""
+        try:
+            with open(self.snapshot_path(session_id)) as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if snapshot['status'] == LIVE and time.time() - snapshot['updated_at'] > self.stale_seconds:
+            snapshot.update(status=FAILED, error="Live session stopped responding")
+        return snapshot
+
+    def stream_events(self, session_id, last_event_id=None, max_seconds=25, poll_interval=1.0,
+                      heartbeat_seconds=15, retry_ms=1000):
+        """Server-Sent Events: one "data:" event per new snapshot until the session finishes or dies.
+
+        A response lasts at most max_seconds so it never holds a worker past
+        gunicorn's timeout; the browser reconnects after retry_ms and sends
+        the last event id (the snapshot's updated_at), so an unchanged
+        snapshot is not sent twice.
+        """
+        started = last_sent = time.time()
+        last_seen = last_event_id
+        yield f"retry: {retry_ms}\n\n"
+        while time.time() - started < max_seconds:
+            snapshot = self.read_snapshot(session_id)
+            if snapshot is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Live session not found'})}\n\n"
+                return
+            event_id = str(snapshot['updated_at'])
+            if event_id != last_seen or snapshot['status'] != LIVE:
+                last_seen, last_sent = event_id, time.time()
+                yield f"id: {event_id}\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot['status'] != LIVE:
+                    return
+            elif time.time() - last_sent >= heartbeat_seconds:
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            time.sleep(poll_interval)
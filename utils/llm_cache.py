@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+def make_cache_key(model, prompt_version, temperature, messages):
+    """Content hash of everything that determines an LLM response."""
+    payload = json.dumps({
+        "model": model,
+        "prompt_version": prompt_version,
+        "temperature": temperature,
+        "messages": messages,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Persistent LRU cache of parsed LLM responses, stored in SQLite.
+
+    Entries beyond max_entries are evicted least-recently-used first.
+    With metrics (a utils.metrics.MetricsStore), hits and misses are
+    counted there, so /metrics shows them for all workers.
+    """
+
+    def __init__(self, db_path, max_entries=5000, metrics=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.metrics = metrics
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        if self.metrics:
+            self.metrics.inc("postchat_llm_cache_hits_total" if row else "postchat_llm_cache_misses_total")
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
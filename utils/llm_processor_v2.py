@@ -1,14 +1,43 @@
 import json
-from openai import OpenAI
-from textblob import TextBlob
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from openai import OpenAI, RateLimitError
 import pandas as pd
 from collections import defaultdict
 from difflib import SequenceMatcher
 import re
-from config import OPENAI_API_KEY, OPENAI_MODEL
+from config import (
+    OPENAI_API_KEY, OPENAI_MODEL, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, OPENAI_RPM, OPENAI_TPM, OPENAI_RATE_LIMIT_PATH,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES,
+    LLM_MAX_COMPLETION_TOKENS, OPENAI_INPUT_COST_PER_1K, OPENAI_OUTPUT_COST_PER_1K,
+    LLM_COLLAPSE_DUPLICATES, LOCAL_SENTIMENT, LLM_RESPONSE_FORMAT, LLM_PARSE_RETRIES, METRICS_PATH
+)
+from utils.llm_cache import LLMCache, make_cache_key
+from utils.persona_cluster import cluster_names, normalize_name
+from utils.batching import count_tokens, plan_batches
+from utils.dedup import collapse_messages, format_weighted
+from utils.sampling import stratified_sample, share_confidence_interval
+from utils.chat_clustering import cluster_exemplars
+from utils.sentiment import score_personas
+from utils.persona_schema import ParseStats, parse_json, response_format, validate_personas
+from utils.metrics import MetricsStore
+from utils.rate_limit import RateGovernor
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Bump whenever the prompt below changes so cached responses are not reused
+PROMPT_VERSION = "v2-3"
+TEMPERATURE = 0.6
+SYSTEM_PROMPT = "You analyze Twitch chats and extract structured insights."
+RESPONSE_FORMAT = response_format(LLM_RESPONSE_FORMAT)
+
+metrics = MetricsStore(METRICS_PATH)
+llm_cache = LLMCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, metrics=metrics)
+rate_governor = RateGovernor(OPENAI_RATE_LIMIT_PATH, OPENAI_RPM, OPENAI_TPM)
+
 # {
 #     "name": "The Backseat Strategist",
 #     "description": "...",
@@ -27,14 +56,105 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 # }
 
 
-def process_comments(comments_df, num_personas=3, sample_size=200):
-    """Single-call processor for personas, summaries, and negativity handling."""
+def build_prompt(sample_comments):
+    prompt = f"""
+            You are an expert in sociolinguistics and behavioral analysis of live streaming communities, specializing in Twitch chat.
+
+            Your task is to analyze the following Twitch chat messages and generate **exactly 3 distinct viewer personas**. These personas should be based on observed patterns in:
+
+            - **Intent** (What the viewer is trying to do — influence, support, socialize)
+            - **Communication Focus** (Who the message is aimed at — Streamer, Chat, or Self)
+            - **Tone or Interaction Style** (e.g., Advice, Hype, Critique, Playfulness)
+
+            Use Schuck’s (2023) viewer types — *System Alterer*, *Financial Sponsor*, and *Social Player* — as a theoretical guide to understanding **underlying motivations**, but **do not use those terms as persona names**. Instead, create your own descriptive labels that reflect how each group communicates.
+
+            ---
+
+            ### Step-by-Step Process
+
+            **Step 1: Categorize Each Message by Intent and Focus**
+
+            For each message, assess:
+            - **Intent**: Is the viewer trying to influence the streamer, support them (financially or emotionally), or engage socially?
+            - **Focus**: Is the message directed at the **streamer**, the **chat**, or the **self**?
+            - **Tone**: Is the tone playful, critical, encouraging, reactive, etc.?
+
+            **Step 2: Group Similar Messages into Personas**
+
+            Cluster messages into **3 coherent groups**, ensuring that each persona is **distinct** in either their intent, focus, or tone. You may combine focus types if appropriate, but each persona must represent a unique communication style.
+
+            ---
+
+            ### Output Format
+
+            Respond with a JSON object with the following format:
+
+            {{
+            "personas": [
+                {{
+                "name": "The Chat Catalyst",
+                "description": "Energizes the community through memes, fast reactions, and light-hearted banter. Keeps the vibe fun and social.",
+                "share": 45,
+                "intent": "Social Engagement",
+                "focus": "Chat-focused",
+                "theme": "Hype",
+                "sentiment_label": "Positive",
+                "sentiment_percent": 92,
+                "feedback": [
+                    "LMAO that timing was perfect 😂",
+                    "yo chat this emote goes hard",
+                    "PogChamp clutch moment"
+                ],
+                "key_feedback": [
+                    {{
+                    "label": "Group Hype and Reactions",
+                    "comments": ["PogChamp clutch moment", "Wtf chat that was insane"],
+                    "recommendation": "Use emote-heavy moments and interactive alerts to fuel this energy."
+                    }}
+                ]
+                }},
+                ...
+            ]
+            }}
+
+            ---
+
+            ### Step 3: Stay Grounded
+
+            Base all insights and personas **only on the provided messages**. Do not speculate or invent motivations beyond what is evident in the content.
+
+            A message prefixed with "(×N)" stands for N identical or near-identical messages. Count it N times when estimating each persona's share.
+
+            ---
+
+            Chat Messages:
+            {json.dumps(sample_comments, indent=2)}
+            """
+    return prompt
+
+
+def process_comments(comments_df, num_personas=3, sample_size=200, use_cache=LLM_CACHE_ENABLED, stats=None, job=None):
+    """Single-call processor for personas, summaries, and negativity handling.
+
+    The response is requested in LLM_RESPONSE_FORMAT and validated against
+    the persona schema; stats (a ParseStats) counts calls, repairs and
+    failures across a run. job identifies the analysis for fair queueing
+    in the rate governor.
+    """
 
     col = 'message' if 'message' in comments_df.columns else 'text'
     comments = comments_df[col].dropna().tolist()
 
     sample_comments = comments[:sample_size]
 
+    stats = stats or ParseStats()
+    cache_key = make_cache_key(OPENAI_MODEL, PROMPT_VERSION, TEMPERATURE, sample_comments)
+    if use_cache:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            stats.increment('cache_hits')
+            return cached
+
     # prompt = f"""
     #     You are an expert in sociolinguistics and behavioral analysis of live streaming communities, specializing in Twitch chat.
 
@@ -126,150 +246,305 @@ def process_comments(comments_df, num_personas=3, sample_size=200):
     #     }}
     #     """
 
-    prompt = f"""
-            You are an expert in sociolinguistics and behavioral analysis of live streaming communities, specializing in Twitch chat.
-
-            Your task is to analyze the following Twitch chat messages and generate **exactly 3 distinct viewer personas**. These personas should be based on observed patterns in:
-
-            - **Intent** (What the viewer is trying to do — influence, support, socialize)
-            - **Communication Focus** (Who the message is aimed at — Streamer, Chat, or Self)
-            - **Tone or Interaction Style** (e.g., Advice, Hype, Critique, Playfulness)
-
-            Use Schuck’s (2023) viewer types — *System Alterer*, *Financial Sponsor*, and *Social Player* — as a theoretical guide to understanding **underlying motivations**, but **do not use those terms as persona names**. Instead, create your own descriptive labels that reflect how each group communicates.
-
-            ---
-
-            ### Step-by-Step Process
-
-            **Step 1: Categorize Each Message by Intent and Focus**
-
-            For each message, assess:
-            - **Intent**: Is the viewer trying to influence the streamer, support them (financially or emotionally), or engage socially?
-            - **Focus**: Is the message directed at the **streamer**, the **chat**, or the **self**?
-            - **Tone**: Is the tone playful, critical, encouraging, reactive, etc.?
-
-            **Step 2: Group Similar Messages into Personas**
-
-            Cluster messages into **3 coherent groups**, ensuring that each persona is **distinct** in either their intent, focus, or tone. You may combine focus types if appropriate, but each persona must represent a unique communication style.
-
-            ---
-
-            ### Output Format
+    prompt = build_prompt(sample_comments)
+    format_kwargs = {"response_format": RESPONSE_FORMAT} if RESPONSE_FORMAT else {}
 
-            Respond with a JSON object with the following format:
-
-            {{
-            "personas": [
-                {{
-                "name": "The Chat Catalyst",
-                "description": "Energizes the community through memes, fast reactions, and light-hearted banter. Keeps the vibe fun and social.",
-                "share": 45,
-                "intent": "Social Engagement",
-                "focus": "Chat-focused",
-                "theme": "Hype",
-                "sentiment_label": "Positive",
-                "sentiment_percent": 92,
-                "feedback": [
-                    "LMAO that timing was perfect 😂",
-                    "yo chat this emote goes hard",
-                    "PogChamp clutch moment"
+    # A response that cannot be parsed or validated is retried, at most LLM_PARSE_RETRIES times
+    for attempt in range(LLM_PARSE_RETRIES + 1):
+        if attempt:
+            stats.increment('retries')
+            print(f"🔁 Retrying batch after an unusable response (attempt {attempt + 1}/{LLM_PARSE_RETRIES + 1})")
+        started = time.perf_counter()
+        try:
+            response = create_completion_with_backoff(
+                job=job,
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
                 ],
-                "key_feedback": [
-                    {{
-                    "label": "Group Hype and Reactions",
-                    "comments": ["PogChamp clutch moment", "Wtf chat that was insane"],
-                    "recommendation": "Use emote-heavy moments and interactive alerts to fuel this energy."
-                    }}
-                ]
-                }},
-                ...
-            ]
-            }}
-
-            ---
-
-            ### Step 3: Stay Grounded
-
-            Base all insights and personas **only on the provided messages**. Do not speculate or invent motivations beyond what is evident in the content.
-
-            ---
-
-            Chat Messages:
-            {json.dumps(sample_comments, indent=2)}
-            """
+                temperature=TEMPERATURE,
+                max_tokens=LLM_MAX_COMPLETION_TOKENS,
+                **format_kwargs
+            )
+        except Exception as e:
+            print("LLM call failed:", e)
+            metrics.observe("postchat_llm_request_seconds", time.perf_counter() - started)
+            metrics.inc("postchat_llm_requests_total", outcome="error")
+            stats.increment('failed_batches')
+            return {}
 
-    try:
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You analyze Twitch chats and extract structured insights."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6,
-            max_tokens=3000
-        )
+        record_usage(response, time.perf_counter() - started, stats)
+        if response.choices[0].finish_reason == "length":
+            print(f"⚠️ LLM output hit max_tokens={LLM_MAX_COMPLETION_TOKENS} for a {len(sample_comments)}-message batch; JSON may be truncated")
         content = response.choices[0].message.content
         print("🔍 Raw LLM content:\n", content)  # Log the full output for inspection
 
         try:
-            start = content.find('{')
-            end = content.rfind('}') + 1
-            json_str = content[start:end]
-            parsed = json.loads(json_str)
-            print("✅ Parsed JSON:\n", json.dumps(parsed, indent=2))  # Pretty-print parsed output
-            return parsed
-        except Exception as e:
+            parsed, repaired = parse_json(content)
+        except ValueError as e:
             print("❌ Error parsing JSON from LLM:", e)
-            print("⚠️ Attempted JSON string:\n", json_str)
-            return {}
+            stats.increment('invalid')
+            continue
+
+        errors = validate_personas(parsed)
+        if errors:
+            print("❌ LLM response failed persona schema validation:", "; ".join(errors))
+            stats.increment('invalid')
+            continue
 
-    except Exception as e:
-        print("LLM call failed:", e)
-        return {}
-    
+        stats.increment('parsed')
+        if repaired:
+            stats.increment('repaired')
+        print("✅ Parsed JSON:\n", json.dumps(parsed, indent=2))  # Pretty-print parsed output
+        if use_cache:
+            llm_cache.set(cache_key, parsed)
+        return parsed
+
+    stats.increment('failed_batches')
+    print(f"❌ Giving up on a {len(sample_comments)}-message batch after {LLM_PARSE_RETRIES + 1} unusable responses")
+    return {}
+
+
+def record_usage(response, seconds, stats):
+    """Latency, tokens and estimated cost of one completion, into the run's stats and the shared metrics."""
+    usage = getattr(response, 'usage', None)
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    cost = (prompt_tokens * OPENAI_INPUT_COST_PER_1K + completion_tokens * OPENAI_OUTPUT_COST_PER_1K) / 1000
+
+    stats.increment('calls')
+    stats.increment('prompt_tokens', prompt_tokens)
+    stats.increment('completion_tokens', completion_tokens)
+    stats.increment('llm_seconds', seconds)
+    stats.increment('cost_usd', cost)
+
+    metrics.observe("postchat_llm_request_seconds", seconds)
+    metrics.inc("postchat_llm_requests_total", outcome="ok")
+    metrics.inc("postchat_llm_tokens_total", prompt_tokens, kind="prompt")
+    metrics.inc("postchat_llm_tokens_total", completion_tokens, kind="completion")
+    metrics.inc("postchat_llm_cost_usd_total", cost)
+
+
+def retry_after_seconds(error, attempt, base_delay=1.0, max_delay=60.0):
+    """Delay before the next attempt: the server's Retry-After if given, else exponential backoff with jitter."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = headers.get('retry-after') if hasattr(headers, 'get') else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), max_delay)
+    except ValueError:
+        pass
+    return min(base_delay * (2 ** attempt), max_delay) * random.uniform(0.5, 1.0)
+
+
+def estimate_request_tokens(kwargs):
+    """Tokens a request counts against TPM before it runs: prompt, schema and max_tokens."""
+    tokens = sum(count_tokens(message.get('content') or '') for message in kwargs.get('messages', []))
+    if kwargs.get('response_format'):
+        tokens += count_tokens(json.dumps(kwargs['response_format']))
+    return tokens + (kwargs.get('max_tokens') or 0)
+
+
+def create_completion_with_backoff(max_retries=LLM_MAX_RETRIES, job=None, **kwargs):
+    """chat.completions.create, admitted by the shared rate governor and retried on 429s."""
+    estimated = estimate_request_tokens(kwargs)
+    for attempt in range(max_retries + 1):
+        waited = rate_governor.acquire(estimated, job=job)
+        if waited >= 0.01:
+            metrics.observe("postchat_llm_rate_wait_seconds", waited)
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except RateLimitError as e:
+            rate_governor.settle(estimated, 0)  # Rejected, so nothing counted; the next attempt is charged afresh
+            rate_governor.throttled()
+            metrics.inc("postchat_llm_requests_total", outcome="rate_limited")
+            if attempt == max_retries:
+                raise
+            delay = retry_after_seconds(e, attempt)
+            print(f"⏳ Rate limited by OpenAI, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            continue
+        except Exception:
+            rate_governor.settle(estimated, 0)  # Never reached the model, give the tokens back
+            raise
+        usage = getattr(response, 'usage', None)
+        rate_governor.settle(estimated, getattr(usage, 'total_tokens', None) or estimated)
+        return response
+
+
+def plan_comment_batches(comments, token_budget):
+    """Token-budgeted batch plan for comments, with calls and projected cost known up front."""
+    template_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(build_prompt([]))
+    if RESPONSE_FORMAT:
+        template_tokens += count_tokens(json.dumps(RESPONSE_FORMAT))  # The schema is billed as input too
+    return plan_batches(
+        comments, token_budget,
+        template_tokens=template_tokens,
+        max_completion_tokens=LLM_MAX_COMPLETION_TOKENS,
+        input_cost_per_1k=OPENAI_INPUT_COST_PER_1K,
+        output_cost_per_1k=OPENAI_OUTPUT_COST_PER_1K
+    )
+
+
+def batch_process_comments(comments_df, batch_size=200, num_personas=3, max_workers=LLM_MAX_CONCURRENCY,
+                           on_batch_done=None, use_cache=LLM_CACHE_ENABLED, token_budget=None, on_plan=None,
+                           collapse_duplicates=LLM_COLLAPSE_DUPLICATES, sample_budget=None, cluster_count=None,
+                           local_sentiment=LOCAL_SENTIMENT, timer=None, job=None):
+    """Run process_comments over batches, up to max_workers at a time.
+
+    With token_budget set, batches are packed up to that many prompt tokens
+    (see plan_comment_batches) and on_plan(summary) receives the call count
+    and projected cost before any call is made; otherwise batches hold
+    batch_size messages. Results are merged in batch order regardless of
+    completion order, so the output matches a sequential run (max_workers=1).
+    on_batch_done(done, total) is called after each batch finishes.
+
+    With collapse_duplicates, repeated and near-duplicate messages are sent
+    once as "(×N) text". Each batch's persona shares are weighted by the
+    number of raw messages the batch stands for, so merged shares stay
+    percentages of the whole chat.
+
+    With sample_budget set, chats larger than the budget are first reduced
+    to a stratified sample (see utils.sampling); each persona then gets a
+    share_ci confidence interval and the result carries the sampling info.
+
+    With cluster_count set, the (collapsed) messages are clustered locally
+    and only a couple of exemplars per cluster are sent, each carrying its
+    share of the cluster's weight, so the number of LLM calls follows the
+    number of clusters instead of the number of messages.
+
+    With local_sentiment on, sentiment_label/sentiment_percent are replaced
+    by local scores over the full chat column (see utils.sentiment).
+
+    With timer (a utils.metrics.StageTimer), every local stage and each LLM
+    batch is recorded as a span.
+
+    job names the analysis to the shared OpenAI rate governor, which
+    interleaves calls from concurrent jobs instead of serving them in
+    arrival order.
+    """
+    def span(stage, **details):
+        return timer.span(stage, **details) if timer else nullcontext()
 
-def batch_process_comments(comments_df, batch_size=200, num_personas=3):
     col = 'message' if 'message' in comments_df.columns else 'text'
-    comments = comments_df[col].dropna().tolist()
-    all_results = []
+    all_messages = comments_df[col].dropna().tolist() if local_sentiment else None
+    sampling = None
+    if sample_budget and len(comments_df) > sample_budget and {'author_id', 'time_in_seconds'} <= set(comments_df.columns):
+        with span('sample'):
+            comments_df, sampling = stratified_sample(comments_df.rename(columns={col: 'text'}), sample_budget)
+        comments_df = comments_df.rename(columns={'text': col})
+        print(f"🎯 Sampled chat for analysis: {sampling}")
+    rows = comments_df[comments_df[col].notna()]
+    comments = rows[col].tolist()
+
+    # Sampled messages carry their stratum's inverse sampling probability
+    weights = rows['sample_weight'].tolist() if 'sample_weight' in rows.columns else [1] * len(comments)
+    if collapse_duplicates:
+        with span('collapse'):
+            collapsed = collapse_messages(comments, weights=weights)
+        print(f"🧹 Collapsed {len(comments)} messages into {len(collapsed)} unique")
+        comments, weights = collapsed.representatives, collapsed.counts
+
+    if cluster_count and len(comments) > 2 * cluster_count:
+        with span('cluster'):
+            comments, weights, _ = cluster_exemplars(comments, weights, cluster_count)
+        print(f"🧩 Clustered chat into {cluster_count} groups, sending {len(comments)} exemplars")
+
+    total_weight = sum(weights) or 1
+    comments = [format_weighted(msg, max(1, round(weight))) for msg, weight in zip(comments, weights)]
+
+    if token_budget:
+        plan = plan_comment_batches(comments, token_budget)
+        print(f"🧮 Batch plan: {plan.summary()}")
+        if on_plan:
+            on_plan(plan.summary())
+        batches = plan.batches
+    else:
+        batches = [comments[i:i + batch_size] for i in range(0, len(comments), batch_size)]
+
+    batch_weights = []
+    start = 0
+    for batch in batches:
+        batch_weights.append(sum(weights[start:start + len(batch)]) / total_weight)
+        start += len(batch)
+
+    batch_dfs = [pd.DataFrame({col: batch}) for batch in batches]  # Maintain original column name
+    done_lock = threading.Lock()
+    done = [0]
+    parse_stats = ParseStats()
+
+    def run_batch(indexed):
+        index, batch_df = indexed
+        with span('llm_batch', batch=index, messages=len(batch_df)):
+            result = process_comments(batch_df, num_personas=num_personas, sample_size=None, use_cache=use_cache,
+                                      stats=parse_stats, job=job)
+        if on_batch_done:
+            with done_lock:
+                done[0] += 1
+                on_batch_done(done[0], len(batch_dfs))
+        return result
+
+    with span('llm'):
+        if max_workers <= 1 or len(batch_dfs) <= 1:
+            results = [run_batch(item) for item in enumerate(batch_dfs)]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(run_batch, enumerate(batch_dfs)))
 
-    for i in range(0, len(comments), batch_size):
-        batch = comments[i:i + batch_size]
-        batch_df = pd.DataFrame({col: batch})  # Maintain original column name
-        result = process_comments(batch_df, num_personas=num_personas)
+    all_results = []
+    for result, batch_weight in zip(results, batch_weights):
         if result and "personas" in result:
+            for persona in result["personas"]:
+                persona["batch_weight"] = batch_weight
             all_results.extend(result["personas"])
 
-    return aggregate_personas(all_results, max_personas=num_personas)
-
+    with span('aggregate'):
+        result = aggregate_personas(all_results, max_personas=num_personas)
+    result["parse_stats"] = parse_stats.summary()
+    print(f"📋 LLM responses: {result['parse_stats']}")
+    if local_sentiment:
+        with span('sentiment'):
+            score_personas(result["personas"], all_messages)
+    if sampling:
+        for persona in result["personas"]:
+            persona["share_ci"] = share_confidence_interval(clean_percent(persona["share"]), sampling)
+        result["sampling"] = sampling
+    return result
+
+
+def fold_personas(previous, previous_messages, new, new_messages, max_personas=3, all_messages=None):
+    """Merge a stored result with personas from newly arrived chat only.
+
+    Both sides' shares are percent of their own messages, so each is
+    weighted by its fraction of all messages before aggregate_personas
+    merges matching names. With all_messages given (and LOCAL_SENTIMENT on),
+    sentiment is rescored over the whole chat.
+    """
+    total = (previous_messages + new_messages) or 1
+    folded = []
+    for personas, messages in ((previous, previous_messages), (new, new_messages)):
+        for persona in personas:
+            folded.append(dict(persona, batch_weight=persona.get('batch_weight', 1) * messages / total))
+
+    result = aggregate_personas(folded, max_personas=max_personas)
+    if LOCAL_SENTIMENT and all_messages is not None:
+        score_personas(result["personas"], all_messages)
+    return result
 
-def normalize_name(name):
-    return re.sub(r'\W+', '', name).lower()
 
 def similar(a, b, threshold=0.75):
     return SequenceMatcher(None, a, b).ratio() >= threshold
 
 def aggregate_personas(personas_list, max_personas=3):
-    merged = []
-    used = set()
+    # Blocking index keeps this sub-quadratic; groups match an all-pairs `similar` scan
+    names = [normalize_name(p['name']) for p in personas_list]
+    merged = [
+        merge_persona_group([personas_list[idx] for idx in group])
+        for group in cluster_names(names, threshold=0.75)
+    ]
 
-    for i, p1 in enumerate(personas_list):
-        if i in used:
-            continue
-        group = [p1]
-        name1 = normalize_name(p1['name'])
-
-        for j, p2 in enumerate(personas_list[i + 1:], start=i + 1):
-            if j in used:
-                continue
-            name2 = normalize_name(p2['name'])
-            if similar(name1, name2):
-                group.append(p2)
-                used.add(j)
-
-        merged_persona = merge_persona_group(group)
-        merged.append(merged_persona)
-        
     merged.sort(key=lambda p: clean_percent(p['share']), reverse=True)
     return {"personas": merged[:max_personas]}
 
@@ -286,9 +561,15 @@ def merge_persona_group(group):
     description = group[0]['description']
     theme = group[0]['theme']
 
-    total_share = sum(clean_percent(p['share']) for p in group)
-    avg_sentiment = sum(clean_percent(p['sentiment_percent']) for p in group) // len(group)
-    dominant_sentiment = group[0]['sentiment_label']  # improve this later
+    # batch_weight is the fraction of all messages a persona's batch covered
+    total_share = round(sum(clean_percent(p['share']) * p.get('batch_weight', 1) for p in group))
+    # Weighted by how much of the chat each batch's persona stood for
+    weights = [max(clean_percent(p['share']) * p.get('batch_weight', 1), 1e-9) for p in group]
+    label_weight = defaultdict(float)
+    for p, weight in zip(group, weights):
+        label_weight[p.get('sentiment_label', 'Neutral')] += weight
+    dominant_sentiment = max(label_weight, key=label_weight.get)
+    avg_sentiment = round(sum(clean_percent(p['sentiment_percent']) * w for p, w in zip(group, weights)) / sum(weights))
 
     all_feedback = []
     key_feedback = []
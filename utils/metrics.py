@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) for latency histograms; LLM calls and whole stages both fit
+LATENCY_BUCKETS = [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900]
+
+HELP = {
+    "postchat_stage_seconds": ("histogram", "Duration of analysis pipeline stages."),
+    "postchat_llm_request_seconds": ("histogram", "Latency of OpenAI chat completion calls."),
+    "postchat_llm_rate_wait_seconds": ("histogram", "Time OpenAI calls waited for the shared rate governor."),
+    "postchat_llm_requests_total": ("counter", "OpenAI chat completion calls by outcome."),
+    "postchat_llm_tokens_total": ("counter", "OpenAI tokens used, from response.usage."),
+    "postchat_llm_cost_usd_total": ("counter", "Estimated OpenAI spend in USD."),
+    "postchat_llm_cache_hits_total": ("counter", "LLM batches answered from the response cache."),
+    "postchat_llm_cache_misses_total": ("counter", "LLM batches not found in the response cache."),
+}
+
+
+def _label_key(labels):
+    return ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+class MetricsStore:
+    """Prometheus counters and histograms shared by every gunicorn worker.
+
+    Values live in a small SQLite table, so /metrics shows the same numbers
+    whichever worker answers. Writes happen per stage or per LLM call, not
+    per request, so the extra write is negligible.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metrics (
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (name, labels)
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _add(self, rows):
+        try:
+            with self.lock, self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+                    rows
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ Failed to record metrics: {e}")  # Never fail an analysis over metrics
+
+    def inc(self, name, amount=1, **labels):
+        self._add([(name, _label_key(labels), amount)])
+
+    def observe(self, name, seconds, **labels):
+        rows = [(f"{name}_sum", _label_key(labels), seconds), (f"{name}_count", _label_key(labels), 1)]
+        for bound in LATENCY_BUCKETS + ['+Inf']:
+            if bound == '+Inf' or seconds <= bound:
+                rows.append((f"{name}_bucket", _label_key(dict(labels, le=bound)), 1))
+        # Buckets that did not fire still need to exist for Prometheus to see a 0
+        for bound in LATENCY_BUCKETS:
+            if seconds > bound:
+                rows.append((f"{name}_bucket", _label_key(dict(labels, le=bound)), 0))
+        self._add(rows)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, labels, value FROM metrics ORDER BY name, labels").fetchall()
+
+        lines = []
+        described = set()
+        for name, labels, value in rows:
+            base = next((b for b in HELP if name == b or name.startswith(b + '_')), name)
+            if base not in described and base in HELP:
+                kind, text = HELP[base]
+                lines.append(f"# HELP {base} {text}")
+                lines.append(f"# TYPE {base} {kind}")
+                described.add(base)
+            lines.append(f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Per-job breakdown of where the time went, also fed into the stage histogram."""
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **details):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, **details)
+
+    def record(self, stage, seconds, **details):
+        with self.lock:
+            self.stages.append(dict(details, stage=stage, seconds=round(seconds, 3)))
+        if self.metrics:
+            self.metrics.observe("postchat_stage_seconds", seconds, stage=stage)
+
+    def summary(self):
+        totals = {}
+        with self.lock:
+            stages = list(self.stages)
+        for entry in stages:
+            totals[entry['stage']] = round(totals.get(entry['stage'], 0) + entry['seconds'], 3)
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "by_stage": totals,
+            "stages": stages,
+        }
@@ -0,0 +1,117 @@
+import math
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+
+def normalize_name(name):
+    return re.sub(r'\W+', '', name).lower()
+
+
+def bigram_counts(name):
+    return Counter(name[i:i + 2] for i in range(len(name) - 1))
+
+
+def short_pair_limit(threshold):
+    """Largest combined length at which two names can clear threshold without sharing a bigram.
+
+    Take the matched characters in order: every consecutive pair that is not a
+    shared bigram costs at least one unmatched character, so a pair of names
+    sharing no bigram has at most (T + 1) / 3 matches out of T total characters,
+    i.e. a ratio of at most 2(T + 1) / 3T. That only reaches threshold for
+    T <= 2 / (3 * threshold - 2). Below threshold 2/3 bigram blocking is not
+    safe at all and every pair is a candidate.
+    """
+    if threshold <= 2 / 3:
+        return float('inf')
+    return int(2 / (3 * threshold - 2) + 1e-9)  # epsilon guards float error, e.g. threshold=0.8
+
+
+def min_shared_bigrams(total_length, threshold):
+    """Lower bound on shared bigram occurrences for a pair that clears threshold.
+
+    Clearing threshold needs M >= threshold * T / 2 matched characters, and at
+    most T - 2M of the M - 1 consecutive matched pairs can be non-bigrams.
+    """
+    min_matches = math.ceil(threshold * total_length / 2 - 1e-9)
+    return max(0, 3 * min_matches - total_length - 1)
+
+
+class NameBlockingIndex:
+    """Bigram inverted index over normalized persona names.
+
+    candidates(i) returns the names that could reach the SequenceMatcher
+    threshold with name i. Every pair it skips is provably below threshold
+    (see short_pair_limit and min_shared_bigrams), so clustering over the
+    candidates gives exactly the same groups as comparing every pair.
+    """
+
+    def __init__(self, names, threshold=0.75):
+        self.names = names
+        self.threshold = threshold
+        self.short_limit = short_pair_limit(threshold)
+        self.grams = [bigram_counts(name) for name in names]
+        self.postings = defaultdict(list)
+        self.short = []
+        for idx, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings[gram].append(idx)
+            if len(names[idx]) <= self.short_limit:
+                self.short.append(idx)
+
+    def candidates(self, idx):
+        name = self.names[idx]
+        shared = Counter()
+        for gram, count in self.grams[idx].items():
+            for other in self.postings[gram]:
+                if other != idx:
+                    shared[other] += min(count, self.grams[other][gram])
+
+        result = set()
+        for other, count in shared.items():
+            total = len(name) + len(self.names[other])
+            if count >= min_shared_bigrams(total, self.threshold):
+                result.add(other)
+
+        for other in self.short:
+            if other != idx and len(name) + len(self.names[other]) <= self.short_limit:
+                result.add(other)
+
+        # Length filter: ratio can never exceed 2 * min(len) / total
+        return sorted(
+            other for other in result
+            if 2 * min(len(name), len(self.names[other])) >= self.threshold * (len(name) + len(self.names[other]))
+        )
+
+
+def cluster_names(names, threshold=0.75):
+    """Greedy seed clustering: each unused name absorbs every later unused name similar to it.
+
+    Returns groups as lists of indices, identical to comparing all pairs with
+    SequenceMatcher but only scoring the candidates the blocking index yields.
+    Repeated names always land in the same group as their first occurrence,
+    so only distinct names are clustered.
+    """
+    occurrences = {}
+    for idx, name in enumerate(names):
+        occurrences.setdefault(name, []).append(idx)
+    unique = list(occurrences)
+
+    index = NameBlockingIndex(unique, threshold)
+    used = set()
+    groups = []
+
+    for i, name in enumerate(unique):
+        if i in used:
+            continue
+        group = [i]
+        for j in index.candidates(i):
+            if j <= i or j in used:
+                continue
+            matcher = SequenceMatcher(None, name, unique[j])
+            if matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold:
+                group.append(j)
+                used.add(j)
+        groups.append(sorted(idx for u in group for idx in occurrences[unique[u]]))
+
+    return groups
@@ -0,0 +1,150 @@
+import json
+import re
+import threading
+
+SENTIMENT_LABELS = ["Positive", "Neutral", "Negative"]
+
+_KEY_FEEDBACK = {
+    "type": "object",
+    "properties": {
+        "label": {"type": "string"},
+        "comments": {"type": "array", "items": {"type": "string"}},
+        "recommendation": {"type": "string"},
+    },
+    "required": ["label", "comments", "recommendation"],
+    "additionalProperties": False,
+}
+
+_PERSONA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "description": {"type": "string"},
+        "share": {"type": "number"},
+        "intent": {"type": "string"},
+        "focus": {"type": "string"},
+        "theme": {"type": "string"},
+        "sentiment_label": {"type": "string", "enum": SENTIMENT_LABELS},
+        "sentiment_percent": {"type": "number"},
+        "feedback": {"type": "array", "items": {"type": "string"}},
+        "key_feedback": {"type": "array", "items": _KEY_FEEDBACK},
+    },
+    "required": [
+        "name", "description", "share", "intent", "focus", "theme",
+        "sentiment_label", "sentiment_percent", "feedback", "key_feedback"
+    ],
+    "additionalProperties": False,
+}
+
+PERSONAS_SCHEMA = {
+    "type": "object",
+    "properties": {"personas": {"type": "array", "items": _PERSONA}},
+    "required": ["personas"],
+    "additionalProperties": False,
+}
+
+# Fields the rest of the pipeline (merge_persona_group, templates) cannot do without
+REQUIRED_FIELDS = ["name", "description", "share", "theme", "sentiment_label", "sentiment_percent"]
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def response_format(mode):
+    """OpenAI response_format for 'json_schema' (strict), 'json_object', or None for free text."""
+    if mode == 'json_schema':
+        return {"type": "json_schema", "json_schema": {"name": "personas", "strict": True, "schema": PERSONAS_SCHEMA}}
+    if mode == 'json_object':
+        return {"type": "json_object"}
+    return None
+
+
+def parse_json(content):
+    """Parse model output, repairing the usual free-text damage.
+
+    Returns (parsed, repaired). Code fences, prose around the object and
+    trailing commas are stripped; anything else raises ValueError.
+    """
+    try:
+        return json.loads(content), False
+    except (TypeError, json.JSONDecodeError):
+        pass
+
+    text = _CODE_FENCE.sub('', (content or '').strip())
+    start, end = text.find('{'), text.rfind('}') + 1
+    if start < 0 or end <= start:
+        raise ValueError("no JSON object in response")
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r'\1', text[start:end])), True
+    except json.JSONDecodeError as e:
+        raise ValueError(f"unparseable JSON: {e}") from e
+
+
+def _as_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.replace('%', '').strip())
+        except ValueError:
+            return None
+    return None
+
+
+def validate_personas(parsed):
+    """Normalize a parsed response in place and return a list of problems (empty if valid).
+
+    Percent strings like "45%" become numbers and missing optional lists
+    become empty. Personas missing REQUIRED_FIELDS make the response invalid.
+    """
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("personas"), list):
+        return ["missing 'personas' list"]
+    if not parsed["personas"]:
+        return ["empty 'personas' list"]
+
+    errors = []
+    for idx, persona in enumerate(parsed["personas"]):
+        if not isinstance(persona, dict):
+            errors.append(f"persona {idx} is not an object")
+            continue
+        missing = [field for field in REQUIRED_FIELDS if persona.get(field) in (None, "")]
+        if missing:
+            errors.append(f"persona {idx} missing {', '.join(missing)}")
+            continue
+        for field in ("share", "sentiment_percent"):
+            number = _as_number(persona[field])
+            if number is None or not 0 <= number <= 100:
+                errors.append(f"persona {idx} has invalid {field}: {persona[field]!r}")
+            else:
+                persona[field] = int(round(number))
+        if persona["sentiment_label"] not in SENTIMENT_LABELS:
+            persona["sentiment_label"] = str(persona["sentiment_label"]).strip().capitalize()
+            if persona["sentiment_label"] not in SENTIMENT_LABELS:
+                errors.append(f"persona {idx} has invalid sentiment_label")
+        persona.setdefault("feedback", [])
+        persona["key_feedback"] = [
+            item for item in persona.get("key_feedback") or []
+            if isinstance(item, dict) and {"label", "comments", "recommendation"} <= item.keys()
+        ]
+    return errors
+
+
+class ParseStats:
+    """Per-run counters for LLM calls, their usage, and how responses were turned into personas."""
+
+    FIELDS = [
+        "calls", "cache_hits", "parsed", "repaired", "invalid", "retries", "failed_batches",
+        "prompt_tokens", "completion_tokens", "llm_seconds", "cost_usd"
+    ]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+
+    def increment(self, field, amount=1):
+        with self.lock:
+            self.counts[field] += amount
+
+    def summary(self):
+        with self.lock:
+            return {field: round(value, 4) if isinstance(value, float) else value for field, value in self.counts.items()}
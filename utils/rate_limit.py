@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import time
+import uuid
+
+DEFAULT_JOB = 'default'
+
+
+class RateGovernor:
+    """OpenAI requests- and tokens-per-minute limits, shared by every gunicorn worker.
+
+    Two token buckets (requests and tokens) refill continuously at the
+    per-minute limits and live in a small SQLite file, so all processes
+    draw from the same budget. Buckets hold burst_seconds worth of
+    allowance, keeping bursts well inside what OpenAI accepts. A call is
+    admitted once both buckets cover it (a call larger than the token
+    bucket is admitted when it is full and leaves it in debt); until then
+    it waits in a queue where the job served least recently goes first,
+    so one large analysis cannot starve the others. Tokens are charged up
+    front from an estimate (prompt + max completion, as OpenAI counts
+    them) and the difference is refunded once usage is known.
+    """
+
+    def __init__(self, db_path, rpm, tpm, burst_seconds=10, poll_interval=0.25, stale_seconds=30):
+        self.db_path = db_path
+        self.rpm = rpm
+        self.tpm = tpm
+        self.capacity = {'requests': max(1.0, rpm * burst_seconds / 60), 'tokens': tpm * burst_seconds / 60}
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds  # Waiters not polling this long belong to a dead process
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    available REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS waiters (
+                    id TEXT PRIMARY KEY,
+                    job TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    seen_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS turns (
+                    job TEXT PRIMARY KEY,
+                    admitted_at REAL NOT NULL
+                )
+            """)
+            now = time.time()
+            conn.executemany(
+                "INSERT OR IGNORE INTO buckets (name, available, updated_at) VALUES (?, ?, ?)",
+                [(name, capacity, now) for name, capacity in self.capacity.items()]
+            )
+
+    @property
+    def enabled(self):
+        return self.rpm > 0 and self.tpm > 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _refill(self, conn, now):
+        """Current bucket levels after topping up for the time since the last update."""
+        levels = {}
+        for row in conn.execute("SELECT name, available, updated_at FROM buckets").fetchall():
+            rate = self.rpm if row['name'] == 'requests' else self.tpm
+            elapsed = max(now - row['updated_at'], 0)
+            levels[row['name']] = min(self.capacity[row['name']], row['available'] + elapsed * rate / 60)
+        return levels
+
+    def _store(self, conn, levels, now):
+        conn.executemany(
+            "UPDATE buckets SET available = ?, updated_at = ? WHERE name = ?",
+            [(value, now, name) for name, value in levels.items()]
+        )
+
+    def acquire(self, tokens, job=None):
+        """Block until one request of about `tokens` tokens may be sent; returns seconds waited."""
+        if not self.enabled:
+            return 0.0
+        tokens = int(tokens)
+        waiter_id = uuid.uuid4().hex
+        started = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO waiters (id, job, tokens, enqueued_at, seen_at) VALUES (?, ?, ?, ?, ?)",
+                (waiter_id, job or DEFAULT_JOB, tokens, started, started)
+            )
+            while True:
+                delay = self._try_admit(conn, waiter_id, job or DEFAULT_JOB, tokens)
+                if delay is None:
+                    return time.time() - started
+                time.sleep(min(max(delay, 0.01), self.poll_interval))
+        except BaseException:
+            conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+            raise
+        finally:
+            conn.close()
+
+    def _try_admit(self, conn, waiter_id, job, tokens):
+        """Admit the waiter if it is at the head of the queue and both buckets cover it.
+
+        Returns None once admitted, else roughly how long to wait before trying again.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()  # Read under the lock, or a late writer would rewind updated_at and refill twice
+        try:
+            conn.execute("UPDATE waiters SET seen_at = ? WHERE id = ?", (now, waiter_id))
+            conn.execute("DELETE FROM waiters WHERE seen_at < ?", (now - self.stale_seconds,))
+            head = conn.execute("""
+                SELECT w.id FROM waiters w LEFT JOIN turns t ON t.job = w.job
+                ORDER BY COALESCE(t.admitted_at, 0), w.enqueued_at LIMIT 1
+            """).fetchone()
+            levels = self._refill(conn, now)
+            if head is None or head['id'] != waiter_id:
+                conn.execute("COMMIT")
+                return self.poll_interval
+            needed = min(tokens, self.capacity['tokens'])
+            if levels['requests'] < 1 or levels['tokens'] < needed:
+                conn.execute("COMMIT")
+                return max((1 - levels['requests']) * 60 / self.rpm, (needed - levels['tokens']) * 60 / self.tpm)
+
+            levels['requests'] -= 1
+            levels['tokens'] -= tokens
+            self._store(conn, levels, now)
+            conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+            conn.execute(
+                "INSERT INTO turns (job, admitted_at) VALUES (?, ?) "
+                "ON CONFLICT(job) DO UPDATE SET admitted_at = excluded.admitted_at",
+                (job, now)
+            )
+            conn.execute("DELETE FROM turns WHERE admitted_at < ?", (now - 3600,))
+            conn.execute("COMMIT")
+            return None
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _adjust(self, requests=None, tokens=0):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = self._refill(conn, now)
+            if requests is not None:
+                levels['requests'] = requests
+            levels['tokens'] = min(self.capacity['tokens'], levels['tokens'] + tokens)
+            self._store(conn, levels, now)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"⚠️ Failed to update OpenAI rate buckets: {e}")
+        finally:
+            conn.close()
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Refund (or charge) the difference between the admitted estimate and the real usage."""
+        if self.enabled:
+            self._adjust(tokens=int(estimated_tokens) - actual_tokens)
+
+    def throttled(self):
+        """OpenAI answered 429 anyway (e.g. another client on the key): empty the request bucket."""
+        if self.enabled:
+            self._adjust(requests=0)
+
+    def utilization(self):
+        """Bucket levels and queue depth, for /metrics."""
+        with self._connect() as conn:
+            levels = self._refill(conn, time.time())
+            queue = conn.execute("SELECT COUNT(*) AS waiting, COUNT(DISTINCT job) AS jobs FROM waiters").fetchone()
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "requests_available": round(levels.get('requests', 0), 2),
+            "tokens_available": round(levels.get('tokens', 0)),
+            "requests_utilization": round(1 - levels.get('requests', 0) / self.capacity['requests'], 4) if self.rpm else 0.0,
+            "tokens_utilization": round(1 - levels.get('tokens', 0) / self.capacity['tokens'], 4) if self.tpm else 0.0,
+            "waiting_calls": queue['waiting'],
+            "waiting_jobs": queue['jobs'],
+        }
+
+    def render(self):
+        """utilization() as Prometheus gauges."""
+        lines = []
+        for key, value in self.utilization().items():
+            name = f"postchat_llm_rate_{key}"
+            lines.append(f"# HELP {name} OpenAI rate governor {key.replace('_', ' ')}.")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,97 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Author activity tiers by messages sent in the VOD: light, regular, heavy
+AUTHOR_TIER_EDGES = [2, 10]
+# Messages of at most this many words (emotes, "W", "lol") form their own stratum
+SHORT_MESSAGE_WORDS = 3
+
+
+def assign_strata(chat_df, bucket_seconds=300):
+    """Stratum key per message: time bucket x author activity tier x message length class."""
+    seconds = chat_df['time_in_seconds'].astype(float).fillna(0).to_numpy()
+    time_bucket = (seconds // bucket_seconds).astype(np.int64)
+
+    author_counts = chat_df['author_id'].map(chat_df['author_id'].value_counts()).fillna(1).to_numpy()
+    author_tier = np.searchsorted(AUTHOR_TIER_EDGES, author_counts, side='left')
+
+    words = chat_df['text'].fillna('').astype(str).str.split().str.len().to_numpy()
+    length_class = (words > SHORT_MESSAGE_WORDS).astype(np.int64)
+
+    return time_bucket * 6 + author_tier * 2 + length_class
+
+
+def allocate(stratum_sizes, budget):
+    """Proportional allocation with largest-remainder rounding, at least one per stratum when affordable."""
+    sizes = np.asarray(stratum_sizes, dtype=float)
+    quotas = sizes * budget / sizes.sum()
+    alloc = np.floor(quotas).astype(np.int64)
+    if budget >= len(sizes):
+        alloc = np.maximum(alloc, 1)
+    remaining = budget - alloc.sum()
+    if remaining > 0:
+        order = np.argsort(-(quotas - np.floor(quotas)), kind='stable')
+        for idx in order[:remaining]:
+            alloc[idx] += 1
+    return np.minimum(alloc, sizes.astype(np.int64))
+
+
+def stratified_sample(chat_df, budget, bucket_seconds=300, seed=0):
+    """Pick about budget messages, stratified by time, author activity and message length.
+
+    Sampling within each stratum is uniform, so every message gets a
+    sample_weight of stratum size / stratum sample size and weighted shares
+    are unbiased estimates for the full chat. Returns (sample_df, info)
+    with info describing the design for share_confidence_interval.
+    """
+    population = len(chat_df)
+    if population <= budget:
+        sample = chat_df.assign(sample_weight=1.0)
+        return sample, {"population": population, "sample_size": population,
+                        "strata": 0, "effective_sample_size": float(population)}
+
+    strata = assign_strata(chat_df, bucket_seconds)
+    keys, inverse, sizes = np.unique(strata, return_inverse=True, return_counts=True)
+    alloc = allocate(sizes, budget)
+
+    rng = np.random.default_rng(seed)
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    picked, weights = [], []
+    for stratum, (start, size, take) in enumerate(zip(starts, sizes, alloc)):
+        if take == 0:
+            continue
+        members = order[start:start + size]
+        chosen = rng.choice(members, size=take, replace=False)
+        picked.append(np.sort(chosen))
+        weights.append(np.full(take, size / take))
+
+    positions = np.concatenate(picked)
+    sample_weight = np.concatenate(weights)
+    in_order = np.argsort(positions, kind='stable')  # Keep chat order for the prompt
+    sample = chat_df.iloc[positions[in_order]].assign(sample_weight=sample_weight[in_order])
+
+    # Kish effective sample size: how many equal-weight draws this design is worth
+    effective = sample_weight.sum() ** 2 / (sample_weight ** 2).sum()
+    return sample, {
+        "population": population,
+        "sample_size": int(len(sample)),
+        "strata": int(len(keys)),
+        "effective_sample_size": round(float(effective), 1),
+    }
+
+
+def share_confidence_interval(share_percent, info, z=1.96):
+    """Approximate CI (in percent) for a persona share estimated from the sample.
+
+    Normal approximation on the effective sample size with a finite
+    population correction; zero width when the whole chat was analyzed.
+    """
+    p = min(max(share_percent / 100, 0.0), 1.0)
+    n_eff = info["effective_sample_size"]
+    if info["sample_size"] >= info["population"] or n_eff <= 0:
+        return [round(p * 100, 1), round(p * 100, 1)]
+    fpc = 1 - info["sample_size"] / info["population"]
+    margin = z * math.sqrt(p * (1 - p) / n_eff * fpc)
+    return [round(max(p - margin, 0.0) * 100, 1), round(min(p + margin, 1.0) * 100, 1)]
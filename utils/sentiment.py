@@ -0,0 +1,208 @@
+import hashlib
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, defaultdict
+import numpy as np
+import pandas as pd
+from utils.chat_clustering import hashed_tf, inverse_document_frequency, tfidf
+
+try:
+    import textblob
+    _TEXTBLOB_LEXICON = os.path.join(os.path.dirname(textblob.__file__), 'en', 'en-sentiment.xml')
+except ImportError:
+    _TEXTBLOB_LEXICON = None
+
+# Twitch/YouTube chat vocabulary the adjective lexicon does not know
+CHAT_LEXICON = {
+    'pog': 0.8, 'pogchamp': 0.8, 'poggers': 0.8, 'pogu': 0.8, 'w': 0.6, 'dub': 0.6, 'gg': 0.5,
+    'hype': 0.7, 'lets': 0.3, 'goat': 0.8, 'clutch': 0.6, 'ez': 0.3, 'love': 0.6, 'thanks': 0.5,
+    'ty': 0.5, 'lol': 0.3, 'lmao': 0.4, 'lul': 0.3, 'kekw': 0.3, 'omegalul': 0.3, 'haha': 0.3,
+    'pepehands': -0.5, 'sadge': -0.5, 'biblethump': -0.4, 'residentsleeper': -0.6, 'l': -0.6,
+    'trash': -0.8, 'boring': -0.7, 'cringe': -0.7, 'yikes': -0.5, 'hate': -0.8, 'throw': -0.4,
+    'throwing': -0.4, 'washed': -0.6, 'ff': -0.4, 'mald': -0.4, 'malding': -0.4, 'scam': -0.7,
+}
+NEGATIONS = {'not', 'no', 'never', "don't", 'dont', "isn't", 'isnt', "wasn't", 'wasnt', "ain't", 'aint'}
+# Same as TextBlob's pattern analyzer: a negated word counts half as much, the other way
+NEGATION_FACTOR = -0.5
+# Polarity above/below +-LABEL_THRESHOLD is Positive/Negative, anything between is Neutral
+LABEL_THRESHOLD = 0.1
+LABELS = ['Negative', 'Neutral', 'Positive']
+# Messages whose best persona cosine is below this match no persona and are left out
+MIN_PERSONA_SIMILARITY = 0.1
+# Unique messages vectorized at once when assigning them to personas
+ASSIGN_CHUNK_SIZE = 8192
+
+_TOKEN_PATTERN = r"[a-z][a-z']*"
+
+
+def load_lexicon(path=_TEXTBLOB_LEXICON):
+    """Word -> polarity from TextBlob's lexicon (averaged over senses), plus CHAT_LEXICON."""
+    senses = defaultdict(list)
+    if path and os.path.exists(path):
+        for word in ET.parse(path).getroot().iter('word'):
+            form = word.get('form', '').lower()
+            if form and ' ' not in form:
+                senses[form].append(float(word.get('polarity', 0)))
+    lexicon = {form: sum(values) / len(values) for form, values in senses.items()}
+    lexicon.update(CHAT_LEXICON)
+    return lexicon
+
+
+class SentimentCache:
+    """Bounded in-process map of message hash -> polarity, evicted least-recently-used."""
+
+    def __init__(self, max_entries=500000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self.lock:
+            found = {}
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+            return found
+
+    def set_many(self, items):
+        with self.lock:
+            self.entries.update(items)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+_lexicon = None
+_cache = SentimentCache()
+
+
+def message_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+def _score_unique(texts):
+    """Mean lexicon polarity of each text, scored in one pass over all tokens."""
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = load_lexicon()
+
+    tokens = pd.Series(texts, dtype=object).str.lower().str.findall(_TOKEN_PATTERN).explode()
+    tokens = tokens.dropna()
+    polarity = tokens.map(_lexicon)
+
+    # Negation flips the next word; only within the same message
+    previous = tokens.groupby(level=0).shift(1)
+    polarity = polarity.where(~previous.isin(NEGATIONS), polarity * NEGATION_FACTOR)
+
+    scores = polarity.dropna().groupby(level=0).mean()
+    return scores.reindex(range(len(texts)), fill_value=0.0).to_numpy(dtype=float)
+
+
+def score_messages(messages):
+    """Polarity in [-1, 1] per message.
+
+    Repeated messages are scored once, and scores are kept per message hash
+    so later runs over the same chat only score what is new.
+    """
+    texts = pd.Series(messages, dtype=object).fillna('').astype(str)
+    codes, uniques = pd.factorize(texts)
+    keys = [message_hash(text) for text in uniques]
+
+    known = _cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in known]
+    unique_scores = np.array([known.get(key, 0.0) for key in keys], dtype=float)
+    if missing:
+        fresh = _score_unique([uniques[i] for i in missing])
+        unique_scores[missing] = fresh
+        _cache.set_many(zip((keys[i] for i in missing), fresh.tolist()))
+
+    return unique_scores[codes] if len(codes) else np.zeros(0)
+
+
+def label_polarities(polarities):
+    """0 = Negative, 1 = Neutral, 2 = Positive, per message."""
+    return np.digitize(polarities, [-LABEL_THRESHOLD, LABEL_THRESHOLD + 1e-12])
+
+
+def sentiment_distribution(polarities, weights=None):
+    """Percent of (weighted) messages per label, the dominant label and the mean polarity."""
+    polarities = np.asarray(polarities, dtype=float)
+    weights = np.ones(len(polarities)) if weights is None else np.asarray(weights, dtype=float)
+    total = weights.sum()
+    if total <= 0:
+        return {"label": "Neutral", "percent": 0, "distribution": {label: 0 for label in LABELS}, "polarity": 0.0}
+
+    counts = np.bincount(label_polarities(polarities), weights=weights, minlength=3)
+    percents = [int(round(100 * count / total)) for count in counts]
+    dominant = int(np.argmax(counts))
+    return {
+        "label": LABELS[dominant],
+        "percent": percents[dominant],
+        "distribution": dict(zip(LABELS, percents)),
+        "polarity": round(float(np.dot(polarities, weights) / total), 3)
+    }
+
+
+def persona_profile(persona):
+    """Text that describes a persona: its name, description, theme and quoted messages."""
+    quotes = list(persona.get('feedback', []))
+    for item in persona.get('key_feedback', []):
+        quotes.extend(item.get('comments', []))
+    return ' '.join([persona.get('name', ''), persona.get('description', ''), persona.get('theme', '')] + quotes)
+
+
+def assign_to_personas(messages, personas, min_similarity=MIN_PERSONA_SIMILARITY, chunk_size=ASSIGN_CHUNK_SIZE):
+    """Index of the most similar persona per message, or -1 when none reaches min_similarity.
+
+    Similarity is hashed TF-IDF cosine against persona profiles. Unique
+    messages are vectorized chunk_size at a time (document frequencies are
+    counted in a first pass), so memory does not grow with the chat.
+    """
+    texts = pd.Series(messages, dtype=object).fillna('').astype(str)
+    codes, uniques = pd.factorize(texts)
+    profiles = [persona_profile(p) for p in personas]
+    chunks = [uniques[start:start + chunk_size] for start in range(0, len(uniques), chunk_size)]
+
+    profile_tf = hashed_tf(profiles)
+    doc_freq = np.count_nonzero(profile_tf, axis=0)
+    for chunk in chunks:
+        doc_freq += np.count_nonzero(hashed_tf(chunk), axis=0)
+    idf = inverse_document_frequency(doc_freq, len(uniques) + len(profiles))
+    persona_vectors = tfidf(profile_tf, idf)
+
+    owners = np.full(len(uniques), -1, dtype=np.int64)
+    for index, chunk in enumerate(chunks):
+        similarity = tfidf(hashed_tf(chunk), idf) @ persona_vectors.T
+        best = similarity.argmax(axis=1)
+        matched = similarity[np.arange(len(best)), best] >= min_similarity
+        owners[index * chunk_size:index * chunk_size + len(chunk)] = np.where(matched, best, -1)
+    return owners[codes]
+
+
+def score_personas(personas, messages, weights=None):
+    """Set sentiment_label/sentiment_percent on each persona from the messages closest to it.
+
+    Every message is scored locally and attributed to the persona it is
+    most similar to, so the figures are real distributions over the chat
+    rather than model guesses. Messages close to no persona are left out,
+    and a persona that gets no messages keeps the model's sentiment.
+    Adds "sentiment" with the full distribution and mean polarity.
+    """
+    if not personas or not len(messages):
+        return personas
+
+    polarities = score_messages(messages)
+    owners = assign_to_personas(messages, personas)
+    weights = np.ones(len(polarities)) if weights is None else np.asarray(weights, dtype=float)
+
+    for idx, persona in enumerate(personas):
+        mine = owners == idx
+        if not mine.any():
+            continue
+        summary = sentiment_distribution(polarities[mine], weights[mine])
+        persona["sentiment_label"] = summary["label"]
+        persona["sentiment_percent"] = f"{summary['percent']}%"
+        persona["sentiment"] = {"distribution": summary["distribution"], "polarity": summary["polarity"],
+                                "messages": int(mine.sum())}
+    return personas
@@ -1,50 +1,55 @@
 import os
-import pandas as pd
 from chat_downloader import ChatDownloader
+from utils.chat_ingest import stream_chat_to_parquet, append_chat_to_parquet, plan_segments, stream_segments_to_parquet
+from utils.chat_store import chat_cursor
+from config import CHAT_DOWNLOAD_SEGMENTS, CHAT_SEGMENT_MIN_SECONDS
 
-def download_twitch_chat(video_url, data_dir, max_messages=1000):
+BOT_NAMES = [
+    'streamelements', 'own3d', 'creatisbot', 'tangiabot', 'nightbot',
+    'overlayexpert', 'moobot', 'botrixoficial', 'streamstickers',
+    'soundalerts', 'streamlabs', 'frostytoolsdotcom', 'wizebot',
+    'fossabot', 'milanitommasobot'
+]
+
+def download_twitch_chat(video_url, data_dir, max_messages=None, incremental=False):
+    """Download a VOD's chat to Parquet.
+
+    With incremental set and chat already stored, only messages after the
+    last stored one are fetched and appended. Otherwise long VODs are
+    fetched as concurrent time segments (see stream_segments_to_parquet).
+    """
     try:
         downloader = ChatDownloader()
-        chat = downloader.get_chat(video_url, max_messages=max_messages)
-        
+
         # Extract VOD ID from URL
         vod_id = video_url.split('/videos/')[-1].split('?')[0]
         
-        messages = []
-        for message in chat:
-            messages.append({
-                'message_id': message.get('message_id'),
-                'text': message.get('message'),
-                'timestamp': message.get('timestamp'),
-                'time_in_seconds': message.get('time_in_seconds'),
-                'author_name': message.get('author', {}).get('name'),
-                'author_id': message.get('author', {}).get('id')
-            })
-        
-        chat_df = pd.DataFrame(messages)
-
-        #bot filtering
-        bot_names = [
-            'streamelements', 'own3d', 'creatisbot', 'tangiabot', 'nightbot', 
-            'overlayexpert', 'moobot', 'botrixoficial', 'streamstickers', 
-            'soundalerts', 'streamlabs', 'frostytoolsdotcom', 'wizebot', 
-            'fossabot', 'milanitommasobot'
-        ]
-
-        chat_df = chat_df[
-            (chat_df['author_id'].notna()) & 
-            (chat_df['author_id'] != '') & 
-            (~chat_df['author_name'].str.lower().isin(bot_names))
-        ]
-        
         # Ensure output directory exists
         output_dir = os.path.join(data_dir, 'twitch_chat')
         os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f'{vod_id}.parquet')
+
+        cursor = chat_cursor(output_path) if incremental else None
+        if cursor and cursor['last_time'] is not None:
+            chat = downloader.get_chat(video_url, start_time=cursor['last_time'], max_messages=max_messages)
+            count = append_chat_to_parquet(chat, output_path, BOT_NAMES, skip_ids=cursor['boundary_ids'])
+            return True, f"Fetched {count} new messages for VOD: {vod_id}"
+
+        chat = downloader.get_chat(video_url, max_messages=max_messages)
+
+        ranges = plan_segments(getattr(chat, 'duration', None), CHAT_DOWNLOAD_SEGMENTS, CHAT_SEGMENT_MIN_SECONDS)
+        if max_messages is None and len(ranges) > 1:
+            print(f"📥 Downloading chat for VOD {vod_id} in {len(ranges)} parallel segments")
+            count = stream_segments_to_parquet(
+                lambda start, end: ChatDownloader().get_chat(video_url, start_time=start, end_time=end),
+                ranges, output_path, BOT_NAMES
+            )
+            return True, f"Downloaded {count} messages for VOD: {vod_id}"
+
+        # Bots are filtered while streaming, so the full VOD is never held in memory
+        count = stream_chat_to_parquet(chat, output_path, BOT_NAMES)
         
-        output_path = os.path.join(output_dir, f'{vod_id}.csv')
-        chat_df.to_csv(output_path, index=False)
-        
-        return True, f"Downloaded {len(chat_df)} messages for VOD: {vod_id}"
+        return True, f"Downloaded {count} messages for VOD: {vod_id}"
     
     except Exception as e:
         return False, f"Error: {str(e)}"
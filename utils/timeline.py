@@ -0,0 +1,74 @@
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+
+class ChatTimeline:
+    """Message-volume timeline over a VOD, backed by one sorted numpy array.
+
+    The sort happens once in the constructor; each call to buckets() is a
+    handful of vectorized passes, so several bucket widths can be served
+    from the same instance.
+    """
+
+    def __init__(self, seconds, categories=None):
+        seconds = np.asarray(seconds, dtype=np.float64)
+        valid = ~np.isnan(seconds)
+        positions = np.flatnonzero(valid)
+
+        self.order = positions[np.argsort(seconds[valid], kind='stable')]
+        self.seconds = seconds[self.order]
+
+        if categories is not None:
+            # factorize keeps first-seen order and maps missing values to -1; empty ones count as missing
+            codes, self.category_names = pd.factorize(pd.Series(categories, dtype=object).replace('', None))
+            self.codes = codes[self.order]
+        else:
+            self.category_names = []
+            self.codes = np.full(len(self.order), -1)
+
+    def __len__(self):
+        return len(self.seconds)
+
+    def buckets(self, bucket_minutes=5):
+        if not len(self.seconds):
+            return []
+
+        width = bucket_minutes * 60
+        bucket_ids = (self.seconds // width).astype(np.int64)
+        keys, starts = np.unique(bucket_ids, return_index=True)
+        counts = np.diff(np.append(starts, len(bucket_ids)))
+        first_indices = np.minimum.reduceat(self.order, starts)
+
+        themes = [None] * len(keys)
+        n_categories = len(self.category_names)
+        has_category = self.codes >= 0
+        if n_categories and has_category.any():
+            slots = np.repeat(np.arange(len(keys)), counts)[has_category]
+            cells = slots * n_categories + self.codes[has_category]
+            tallies = np.bincount(cells, minlength=len(keys) * n_categories).reshape(len(keys), n_categories)
+            # Ties go to the category seen first within the bucket, like Counter.most_common
+            first_seen = np.full(len(keys) * n_categories, np.iinfo(np.int64).max)
+            np.minimum.at(first_seen, cells, self.order[has_category])
+            first_seen = first_seen.reshape(len(keys), n_categories)
+            tied = tallies == tallies.max(axis=1, keepdims=True)
+            dominant = np.where(tied, first_seen, np.iinfo(np.int64).max).argmin(axis=1)
+            themes = [
+                self.category_names[c] if tallies[b, c] else None
+                for b, c in enumerate(dominant)
+            ]
+
+        return [
+            {
+                "time": str(timedelta(seconds=int(key * width))),
+                "count": int(count),
+                "first_index": int(first),
+                "theme": theme
+            }
+            for key, count, first, theme in zip(keys, counts, first_indices, themes)
+        ]
+
+
+def parse_clock_times(times):
+    """Vectorized "H:M:S" -> seconds."""
+    return pd.to_timedelta(pd.Series(times, dtype=object)).dt.total_seconds().to_numpy()
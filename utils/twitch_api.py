@@ -1,33 +1,52 @@
 # utils/twitch_api.py
 
-import requests
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from utils import http_client
 
 load_dotenv()
 
 CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
 CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
 
-def get_app_token():
-    url = "https://id.twitch.tv/oauth2/token"
-    data = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "client_credentials"
-    }
-    response = requests.post(url, data=data)
-    response.raise_for_status()
-    return response.json()["access_token"]
+# Refresh the app token this many seconds before Twitch says it expires
+TOKEN_REFRESH_MARGIN = 300
+
+_token_cache = {"access_token": None, "expires_at": 0}
+_token_lock = threading.Lock()
+
+def get_app_token(force_refresh=False):
+    with _token_lock:
+        if not force_refresh and _token_cache["access_token"] and time.time() < _token_cache["expires_at"] - TOKEN_REFRESH_MARGIN:
+            return _token_cache["access_token"]
+
+        url = "https://id.twitch.tv/oauth2/token"
+        data = {
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "grant_type": "client_credentials"
+        }
+        response = http_client.post(url, data=data)
+        response.raise_for_status()
+        payload = response.json()
+        _token_cache["access_token"] = payload["access_token"]
+        _token_cache["expires_at"] = time.time() + payload.get("expires_in", 0)
+        return _token_cache["access_token"]
 
 def get_vod_metadata(vod_id):
-    token = get_app_token()
-    headers = {
-        "Client-ID": CLIENT_ID,
-        "Authorization": f"Bearer {token}"
-    }
     url = f"https://api.twitch.tv/helix/videos?id={vod_id}"
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=_auth_headers(get_app_token()))
+    if response.status_code == 401:
+        # Token revoked or expired early; mint a fresh one and retry once
+        response = http_client.get(url, headers=_auth_headers(get_app_token(force_refresh=True)))
     response.raise_for_status()
     data = response.json()
     return data["data"][0] if data["data"] else None
+
+def _auth_headers(token):
+    return {
+        "Client-ID": CLIENT_ID,
+        "Authorization": f"Bearer {token}"
+    }
@@ -1,8 +1,8 @@
 # utils/youtube_api.py
 
-import requests
 import os
 from dotenv import load_dotenv
+from utils import http_client
 
 load_dotenv()
 API_KEY = os.getenv("YOUTUBE_API_KEY")
@@ -15,7 +15,7 @@ def get_video_metadata(video_id):
         "part": "snippet,contentDetails,statistics"
     }
 
-    response = requests.get(url, params=params)
+    response = http_client.get(url, params=params)
     response.raise_for_status()
     data = response.json()
     items = data.get("items", [])
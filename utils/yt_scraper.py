@@ -1,17 +1,20 @@
 import os
-import pandas as pd
 from chat_downloader import ChatDownloader
+from utils.chat_ingest import stream_chat_to_parquet, append_chat_to_parquet, plan_segments, stream_segments_to_parquet
+from utils.chat_store import chat_cursor
+from config import CHAT_DOWNLOAD_SEGMENTS, CHAT_SEGMENT_MIN_SECONDS
 
-def download_youtube_chat(video_url, data_dir, max_messages=1000):
+KNOWN_YOUTUBE_BOTS = [
+    'nightbot', 'streamlabs', 'soundalerts', 'streamelements'
+]
+
+def download_youtube_chat(video_url, data_dir, max_messages=None, incremental=False):
+    """Download a video's replay chat to Parquet; see download_twitch_chat for incremental."""
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36'
         }
         downloader = ChatDownloader(headers=headers)
-        chat = downloader.get_chat(
-            url=video_url,
-            max_messages=max_messages
-        )
 
         # Extract YouTube video ID
         if "v=" in video_url:
@@ -19,37 +22,34 @@ def download_youtube_chat(video_url, data_dir, max_messages=1000):
         else:
             video_id = video_url.split("/")[-1]
 
-        messages = []
-        for message in chat:
-            messages.append({
-                'message_id': message.get('message_id'),
-                'text': message.get('message'),
-                'timestamp': message.get('timestamp'),
-                'time_in_seconds': message.get('time_in_seconds'),
-                'author_name': message.get('author', {}).get('name'),
-                'author_id': message.get('author', {}).get('id')
-            })
-
-        chat_df = pd.DataFrame(messages)
-
-        # --- Bot Filtering ---
-        known_youtube_bots = [
-            'nightbot', 'streamlabs', 'soundalerts', 'streamelements'
-        ]
-
-        chat_df = chat_df[
-            (chat_df['author_id'].notna()) &
-            (chat_df['author_id'] != '') &
-            (~chat_df['author_name'].str.lower().isin(known_youtube_bots))
-        ]
-
         output_dir = os.path.join(data_dir, 'youtube_chat')
         os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f'{video_id}.parquet')
+
+        cursor = chat_cursor(output_path) if incremental else None
+        if cursor and cursor['last_time'] is not None:
+            chat = downloader.get_chat(url=video_url, start_time=cursor['last_time'], max_messages=max_messages)
+            count = append_chat_to_parquet(chat, output_path, KNOWN_YOUTUBE_BOTS, skip_ids=cursor['boundary_ids'])
+            return True, f"Fetched {count} new messages for video: {video_id}"
+
+        chat = downloader.get_chat(
+            url=video_url,
+            max_messages=max_messages
+        )
+
+        ranges = plan_segments(getattr(chat, 'duration', None), CHAT_DOWNLOAD_SEGMENTS, CHAT_SEGMENT_MIN_SECONDS)
+        if max_messages is None and len(ranges) > 1:
+            print(f"📥 Downloading chat for video {video_id} in {len(ranges)} parallel segments")
+            count = stream_segments_to_parquet(
+                lambda start, end: ChatDownloader(headers=headers).get_chat(url=video_url, start_time=start, end_time=end),
+                ranges, output_path, KNOWN_YOUTUBE_BOTS
+            )
+            return True, f"Downloaded {count} messages for video: {video_id}"
 
-        output_path = os.path.join(output_dir, f'{video_id}.csv')
-        chat_df.to_csv(output_path, index=False)
+        # Bots are filtered while streaming, so the full VOD is never held in memory
+        count = stream_chat_to_parquet(chat, output_path, KNOWN_YOUTUBE_BOTS)
 
-        return True, f"Downloaded {len(chat_df)} messages for video: {video_id}"
+        return True, f"Downloaded {count} messages for video: {video_id}"
 
     except Exception as e:
         return False, f"Error: {str(e)}"